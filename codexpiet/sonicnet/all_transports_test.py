@@ -6,81 +6,252 @@ import sys
 import os
 import asyncio
 import json
+import time
+import traceback
+from array import array
+from collections import namedtuple
 from datetime import datetime
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-def write_test_result(filename, data):
-    """Write test results to file."""
-    output_dir = os.path.join(os.path.dirname(__file__), 'test_outputs')
-    os.makedirs(output_dir, exist_ok=True)
-    filepath = os.path.join(output_dir, filename)
+from enhanced_client import SonicWaveClient
+from packet import UrgencyLevel
 
-    with open(filepath, 'w', encoding='utf-8') as f:
-        if isinstance(data, dict):
-            json.dump(data, f, indent=2, default=str)
-        else:
-            f.write(str(data))
+# Upper bound on the wait for test packets to come back through the mesh
+PROPAGATION_WINDOW = 3
+
+# Per-transport counters, extracted once from the raw stats dict
+TransportSummary = namedtuple('TransportSummary', 'name running sent received errors raw')
+
+# Results are serialized up front and written through one large buffer
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Received packets are written to the results file in batches of this size
+RECEIVE_BATCH_SIZE = 64
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_outputs')
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+def _json_default(obj):
+    """Fallback encoder hook: ISO format for datetimes, str() for anything else."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+def encode_json(data):
+    """Serialize data to indented JSON bytes, formatting datetimes as ISO strings."""
+    if ORJSON_AVAILABLE:
+        # orjson formats datetime objects natively
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(data, indent=2, default=_json_default).encode('utf-8')
+
+def write_text_result(filename, text):
+    """Write a text report to the output directory."""
+    filepath = os.path.join(OUTPUT_DIR, filename)
+
+    with open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(text.encode('utf-8'))
 
     print(f"📝 Results written to: {filepath}")
 
-async def test_all_transports():
-    """Test all three transports: UDP, BLE, and GGWave."""
+class ResultStream:
+    """Writes a results JSON object to disk section by section as the test runs."""
+
+    def __init__(self, filepath, header):
+        self.filepath = filepath
+        self.in_array = False
+        self._first_section = True
+        self._first_item = True
+        self._file = open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+        self._file.write(b'{\n')
+        for key, value in header.items():
+            self._file.write(encode_json(key) + b': ' + encode_json(value) + b',\n')
+        self._file.write(b'"results": {')
+
+    def _start_section(self, key):
+        self._file.write(b'\n' if self._first_section else b',\n')
+        self._first_section = False
+        self._file.write(encode_json(key) + b': ')
+
+    def write_section(self, key, value):
+        """Write one complete entry of the results object."""
+        self._start_section(key)
+        self._file.write(encode_json(value))
+
+    def begin_array(self, key):
+        """Open a results entry whose list items are written with write_items()."""
+        self._start_section(key)
+        self._file.write(b'[')
+        self.in_array = True
+        self._first_item = True
+
+    def write_items(self, items):
+        """Append items to the array opened by begin_array()."""
+        for item in items:
+            self._file.write(b'\n' if self._first_item else b',\n')
+            self._first_item = False
+            self._file.write(encode_json(item))
+
+    def end_array(self):
+        self._file.write(b']')
+        self.in_array = False
+
+    def close(self):
+        """Terminate the JSON document and close the file."""
+        if self.in_array:
+            self.end_array()
+        self._file.write(b'\n}\n}\n')
+        self._file.close()
+        print(f"📝 Results written to: {self.filepath}")
+
+class ReceivedPackets:
+    """Column-oriented buffer of received packets waiting to be written out."""
+
+    def __init__(self):
+        self.packet_ids = []
+        self.types = []
+        self.senders = []
+        self.messages = []
+        self.vias = []
+        self.ts_ns = array('Q')
+
+    def __len__(self):
+        return len(self.packet_ids)
+
+    def append(self, packet, ts_ns):
+        self.packet_ids.append(packet.packet_id)
+        self.types.append(packet.packet_type.value)
+        self.senders.append(packet.sender_id)
+        self.messages.append(packet.message)
+        self.vias.append(packet.received_via)
+        self.ts_ns.append(ts_ns)
+
+    def to_records(self, wall_t0, ns_t0):
+        """Build the per-packet result dicts, timestamps resolved against the anchor pair."""
+        return [
+            {
+                'packet_id': packet_id,
+                'type': packet_type,
+                'sender': sender,
+                'message': message,
+                'received_via': via,
+                'timestamp': perf_ns_to_datetime(ns, wall_t0, ns_t0)
+            }
+            for packet_id, packet_type, sender, message, via, ns in zip(
+                self.packet_ids, self.types, self.senders, self.messages, self.vias, self.ts_ns)
+        ]
+
+    def clear(self):
+        self.packet_ids.clear()
+        self.types.clear()
+        self.senders.clear()
+        self.messages.clear()
+        self.vias.clear()
+        del self.ts_ns[:]
+
+def flush_log(lines):
+    """Write buffered log lines to stdout in one call and empty the buffer."""
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
+        lines.clear()
+
+def perf_ns_to_datetime(ns, wall_t0, ns_t0):
+    """Convert a perf_counter_ns() stamp to a datetime using a (wall, ns) anchor pair."""
+    return datetime.fromtimestamp(wall_t0 + (ns - ns_t0) / 1e9)
+
+def summarize_transport(transport_name, transport_stats):
+    """Collapse a transport's stats dict into a TransportSummary."""
+    g = transport_stats.get
+    return TransportSummary(
+        name=transport_name,
+        running=g('running', False),
+        sent=g('packets_sent', 0) + g('messages_sent', 0),
+        received=g('packets_received', 0) + g('messages_received', 0),
+        errors=g('send_errors', 0) + g('audio_errors', 0) + g('system_errors', 0),
+        raw=transport_stats
+    )
+
+async def test_all_transports(results_path):
+    """Test all three transports: UDP, BLE, and GGWave.
+
+    Detailed results are streamed to results_path as each phase completes;
+    the returned dict only carries what the summary needs.
+    """
 
     test_results = {
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': datetime.now(),
         'test_name': 'All Transports Send/Receive Test',
         'transports_tested': ['UDP', 'BLE', 'GGWave'],
         'results': {}
     }
+    stream = ResultStream(results_path, {k: v for k, v in test_results.items() if k != 'results'})
+
+    def record(key, value):
+        # Small entries are kept for the summary, everything goes to the file
+        test_results['results'][key] = value
+        stream.write_section(key, value)
 
     print("🚀 ALL TRANSPORTS TEST - UDP + BLE + GGWave")
     print("=" * 60)
 
-    try:
-        from enhanced_client import SonicWaveClient
-        from packet import UrgencyLevel
+    # Receive notifications are buffered during the test window
+    receive_log = []
+
+    # Received packets, stamped with perf_counter_ns() and converted to
+    # wall-clock time when their batch is written out
+    pending_packets = ReceivedPackets()
+    received_count = 0
+    wall_t0, ns_t0 = time.time(), time.perf_counter_ns()
+    # Set when a packet arrives; the client drops its own, so any packet is from another sender
+    packet_event = asyncio.Event()
+
+    def flush_received():
+        stream.write_items(pending_packets.to_records(wall_t0, ns_t0))
+        pending_packets.clear()
+
+    def on_packet_received(packet):
+        nonlocal received_count
+        packet_event.set()
+        received_count += 1
+        pending_packets.append(packet, time.perf_counter_ns())
+        receive_log.append(f"📨 RECEIVED: {packet.packet_type.value} from {packet.sender_id} "
+                           f"via {packet.received_via}")
+        if stream.in_array and len(pending_packets) >= RECEIVE_BATCH_SIZE:
+            flush_received()
 
+    try:
         # Create test client
         client = SonicWaveClient("AllTransportsTest")
 
-        # Track received packets
-        received_packets = []
-
-        def on_packet_received(packet):
-            received_packets.append({
-                'packet_id': packet.packet_id,
-                'type': packet.packet_type.value,
-                'sender': packet.sender_id,
-                'message': packet.message,
-                'received_via': packet.received_via,
-                'timestamp': datetime.now().isoformat()
-            })
-            print(f"📨 RECEIVED: {packet.packet_type.value} from {packet.sender_id}")
-
         client.register_event_callback('packet_received', on_packet_received)
 
         print("🔧 Starting SonicNet client with all transports...")
         await client.start()
 
-        # Wait for initialization
-        await asyncio.sleep(3)
-
-        # Get initial transport status
-        stats = client.get_comprehensive_stats()
+        # Get initial transport status, full stats are only collected at the end
         initial_transport_status = {}
 
-        for transport_name, transport_stats in stats['transport_stats'].items():
-            running = transport_stats.get('running', False)
-            initial_transport_status[transport_name] = {
-                'running': running,
-                'initial_stats': transport_stats
-            }
+        for transport_name, running in client.get_running_map().items():
+            initial_transport_status[transport_name] = {'running': running}
             status = "🟢 ACTIVE" if running else "🔴 INACTIVE"
             print(f"  {transport_name}: {status}")
 
-        test_results['results']['initial_status'] = initial_transport_status
+        stream.write_section('initial_status', initial_transport_status)
 
         # Count active transports
         active_transports = [name for name, status in initial_transport_status.items()
@@ -90,86 +261,95 @@ async def test_all_transports():
         print(f"   {', '.join(active_transports)}")
 
         if len(active_transports) == 0:
-            test_results['results']['error'] = "No transports active"
+            record('error', "No transports active")
             return test_results
 
+        # Packets received from here on are streamed into the results file
+        stream.begin_array('received_packets')
+
         # Test packet transmission
         print(f"\n🔥 TESTING PACKET TRANSMISSION...")
 
-        # Send test packets
+        # Send test packets as one batch, flushed to the transports on exit
         test_packets = []
 
-        # Test 1: Critical SOS
-        print("1️⃣ Sending CRITICAL SOS...")
-        sos1 = await client.send_sos(
-            "CRITICAL: All transports test - emergency packet",
-            UrgencyLevel.CRITICAL
-        )
-        test_packets.append(('CRITICAL_SOS', sos1.packet_id))
-        await asyncio.sleep(2)
-
-        # Test 2: High priority SOS
-        print("2️⃣ Sending HIGH priority SOS...")
-        sos2 = await client.send_sos(
-            "HIGH: Multi-transport mesh test packet",
-            UrgencyLevel.HIGH
-        )
-        test_packets.append(('HIGH_SOS', sos2.packet_id))
-        await asyncio.sleep(2)
-
-        # Test 3: Status update
-        print("3️⃣ Sending status update...")
-        status_update = await client.send_status_update(
-            "Status: All transports operational",
-            sos1.thread_id
-        )
-        test_packets.append(('STATUS_UPDATE', status_update.packet_id))
-        await asyncio.sleep(2)
-
-        # Test 4: All clear
-        print("4️⃣ Sending all clear...")
-        all_clear = await client.send_all_clear(sos1.thread_id)
-        test_packets.append(('ALL_CLEAR', all_clear.packet_id))
-        await asyncio.sleep(3)
+        async with client.batch_sends():
+            # Test 1: Critical SOS
+            print("1️⃣ Sending CRITICAL SOS...")
+            sos1 = await client.send_sos(
+                "CRITICAL: All transports test - emergency packet",
+                UrgencyLevel.CRITICAL
+            )
+            test_packets.append(('CRITICAL_SOS', sos1.packet_id))
+
+            # Test 2: High priority SOS
+            print("2️⃣ Sending HIGH priority SOS...")
+            sos2 = await client.send_sos(
+                "HIGH: Multi-transport mesh test packet",
+                UrgencyLevel.HIGH
+            )
+            test_packets.append(('HIGH_SOS', sos2.packet_id))
+
+            # Test 3: Status update
+            print("3️⃣ Sending status update...")
+            status_update = await client.send_status_update(
+                "Status: All transports operational",
+                sos1.thread_id
+            )
+            test_packets.append(('STATUS_UPDATE', status_update.packet_id))
+
+            # Test 4: All clear
+            print("4️⃣ Sending all clear...")
+            all_clear = await client.send_all_clear(sos1.thread_id)
+            test_packets.append(('ALL_CLEAR', all_clear.packet_id))
+
+        # Stop waiting as soon as another device is heard after the batch, or after one propagation window
+        packet_event.clear()
+        try:
+            await asyncio.wait_for(packet_event.wait(), timeout=PROPAGATION_WINDOW)
+        except asyncio.TimeoutError:
+            pass
+        flush_log(receive_log)
 
         # Get final transport statistics
         final_stats = client.get_comprehensive_stats()
-        final_transport_status = {}
+        final_transport_status = final_stats['transport_stats']
+
+        # Transports are classified in the same pass that prints them
+        working_transports = []
+        partial_transports = []
+        failed_transports = []
 
         print(f"\n📊 FINAL TRANSPORT STATISTICS:")
-        for transport_name, transport_stats in final_stats['transport_stats'].items():
-            final_transport_status[transport_name] = transport_stats
+        for transport_name, transport_stats in final_transport_status.items():
+            summary = summarize_transport(transport_name, transport_stats)
+            g = transport_stats.get
+
+            if summary.running and summary.sent > 0 and summary.errors == 0:
+                working_transports.append(transport_name)
+            elif summary.running and summary.sent > 0:
+                partial_transports.append(transport_name)
+            else:
+                failed_transports.append(transport_name)
 
             print(f"\n🚀 {transport_name}:")
-            print(f"   Status: {'🟢 ACTIVE' if transport_stats.get('running', False) else '🔴 INACTIVE'}")
+            print(f"   Status: {'🟢 ACTIVE' if summary.running else '🔴 INACTIVE'}")
 
             # Show packets sent/received
-            packets_sent = (transport_stats.get('packets_sent', 0) +
-                           transport_stats.get('messages_sent', 0))
-            packets_received = (transport_stats.get('packets_received', 0) +
-                               transport_stats.get('messages_received', 0))
-
-            print(f"   Packets Sent: {packets_sent}")
-            print(f"   Packets Received: {packets_received}")
+            print(f"   Packets Sent: {summary.sent}")
+            print(f"   Packets Received: {summary.received}")
 
             # Show errors
-            errors = (transport_stats.get('send_errors', 0) +
-                     transport_stats.get('audio_errors', 0) +
-                     transport_stats.get('system_errors', 0))
-            print(f"   Errors: {errors}")
+            print(f"   Errors: {summary.errors}")
 
             # Transport-specific info
             if transport_name == "BLEMeshTransport":
-                print(f"   BLE System Works: {transport_stats.get('ble_system_works', False)}")
-                print(f"   Discovered Peers: {transport_stats.get('discovered_peers', 0)}")
+                print(f"   BLE System Works: {g('ble_system_works', False)}")
+                print(f"   Discovered Peers: {g('discovered_peers', 0)}")
             elif transport_name == "GGWaveTransport":
-                print(f"   Audio Available: {transport_stats.get('audio_available', False)}")
+                print(f"   Audio Available: {g('audio_available', False)}")
             elif transport_name == "UDPMeshTransport":
-                print(f"   Multicast: {transport_stats.get('multicast_group', 'N/A')}")
-
-        test_results['results']['final_status'] = final_transport_status
-        test_results['results']['test_packets'] = test_packets
-        test_results['results']['received_packets'] = received_packets
+                print(f"   Multicast: {g('multicast_group', 'N/A')}")
 
         # Overall network stats
         network_stats = final_stats['packet_stats']
@@ -178,47 +358,29 @@ async def test_all_transports():
         print(f"   Total Packets Received: {network_stats['packets_received']}")
         print(f"   Packets Relayed: {network_stats['packets_relayed']}")
 
-        test_results['results']['network_stats'] = network_stats
-
-        # Reception analysis
+        # Reception analysis, per-packet details were logged as they arrived
         print(f"\n📨 PACKET RECEPTION ANALYSIS:")
         print(f"   Test Packets Sent: {len(test_packets)}")
-        print(f"   Packets Received: {len(received_packets)}")
-
-        if received_packets:
-            print(f"   Reception Details:")
-            for packet in received_packets:
-                print(f"     📦 {packet['packet_id'][:8]}: {packet['type']} via {packet['received_via']}")
+        print(f"   Packets Received: {received_count}")
 
         await client.stop()
 
-        # Final assessment
-        print(f"\n🎯 TRANSPORT ASSESSMENT:")
+        # No more callbacks after stop(), close the received packets array
+        flush_received()
+        stream.end_array()
 
-        working_transports = []
-        partial_transports = []
-        failed_transports = []
+        stream.write_section('final_status', final_transport_status)
+        stream.write_section('test_packets', test_packets)
+        stream.write_section('network_stats', network_stats)
 
-        for transport_name, transport_stats in final_transport_status.items():
-            packets_sent = (transport_stats.get('packets_sent', 0) +
-                           transport_stats.get('messages_sent', 0))
-            errors = (transport_stats.get('send_errors', 0) +
-                     transport_stats.get('audio_errors', 0) +
-                     transport_stats.get('system_errors', 0))
-            running = transport_stats.get('running', False)
-
-            if running and packets_sent > 0 and errors == 0:
-                working_transports.append(transport_name)
-            elif running and packets_sent > 0:
-                partial_transports.append(transport_name)
-            else:
-                failed_transports.append(transport_name)
+        # Final assessment
+        print(f"\n🎯 TRANSPORT ASSESSMENT:")
 
-        test_results['results']['assessment'] = {
+        record('assessment', {
             'working': working_transports,
             'partial': partial_transports,
             'failed': failed_transports
-        }
+        })
 
         print(f"  ✅ Fully Working: {working_transports}")
         print(f"  ⚠️  Partially Working: {partial_transports}")
@@ -229,63 +391,78 @@ async def test_all_transports():
 
         if total_working >= 2:
             print(f"\n🎉 EXCELLENT! {total_working} transports working - MESH READY!")
-            test_results['results']['overall_status'] = 'EXCELLENT'
+            record('overall_status', 'EXCELLENT')
         elif total_working == 1:
             print(f"\n👍 GOOD! {total_working} transport working - Basic functionality")
-            test_results['results']['overall_status'] = 'GOOD'
+            record('overall_status', 'GOOD')
         else:
             print(f"\n❌ ISSUES! No transports working properly")
-            test_results['results']['overall_status'] = 'FAILED'
+            record('overall_status', 'FAILED')
 
         return test_results
 
     except Exception as e:
-        test_results['results']['error'] = str(e)
-        test_results['results']['overall_status'] = 'ERROR'
+        if stream.in_array:
+            flush_received()
+            stream.end_array()
+        record('error', str(e))
+        record('overall_status', 'ERROR')
         print(f"❌ Test failed: {e}")
-        import traceback
-        test_results['results']['traceback'] = traceback.format_exc()
+        if os.environ.get('SONICNET_TEST_DEBUG'):
+            record('traceback', traceback.format_exc())
         return test_results
 
+    finally:
+        flush_log(receive_log)
+        stream.close()
+
 async def main():
     """Main test function."""
     print("🧪 Testing ALL transports: UDP + BLE + GGWave")
     print("📡 This will show which transports can send/receive packets")
     print()
 
-    results = await test_all_transports()
-
-    # Write detailed results to file
+    # Detailed results are streamed to file while the test runs
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    write_test_result(f'all_transports_test_{timestamp}.json', results)
+    results_path = os.path.join(OUTPUT_DIR, f'all_transports_test_{timestamp}.json')
+    results = await test_all_transports(results_path)
 
     # Write summary
-    working = results['results'].get('assessment', {}).get('working', [])
-    partial = results['results'].get('assessment', {}).get('partial', [])
-    failed = results['results'].get('assessment', {}).get('failed', [])
-
-    summary = f"""
-ALL TRANSPORTS TEST SUMMARY
-===========================
-Timestamp: {results['timestamp']}
-
-RESULTS:
-✅ Fully Working: {len(working)} transports
-   {', '.join(working) if working else 'None'}
-
-⚠️ Partially Working: {len(partial)} transports  
-   {', '.join(partial) if partial else 'None'}
-
-❌ Not Working: {len(failed)} transports
-   {', '.join(failed) if failed else 'None'}
-
-OVERALL STATUS: {results['results'].get('overall_status', 'UNKNOWN')}
-
-RECOMMENDATION:
-{'🎉 Your SonicNet mesh is ready for deployment!' if len(working) + len(partial) >= 2 else '🔧 Some transports need fixes for full mesh capability'}
-"""
-
-    write_test_result(f'transport_summary_{timestamp}.txt', summary)
+    assessment = results['results'].get('assessment', {})
+    working = assessment.get('working', [])
+    partial = assessment.get('partial', [])
+    failed = assessment.get('failed', [])
+
+    if len(working) + len(partial) >= 2:
+        recommendation = '🎉 Your SonicNet mesh is ready for deployment!'
+    else:
+        recommendation = '🔧 Some transports need fixes for full mesh capability'
+
+    parts = [
+        '',
+        'ALL TRANSPORTS TEST SUMMARY',
+        '=' * 27,
+        f"Timestamp: {results['timestamp'].isoformat()}",
+        '',
+        'RESULTS:',
+        f"✅ Fully Working: {len(working)} transports",
+        f"   {', '.join(working) or 'None'}",
+        '',
+        f"⚠️ Partially Working: {len(partial)} transports",
+        f"   {', '.join(partial) or 'None'}",
+        '',
+        f"❌ Not Working: {len(failed)} transports",
+        f"   {', '.join(failed) or 'None'}",
+        '',
+        f"OVERALL STATUS: {results['results'].get('overall_status', 'UNKNOWN')}",
+        '',
+        'RECOMMENDATION:',
+        recommendation,
+        '',
+    ]
+    summary = '\n'.join(parts)
+
+    write_text_result(f'transport_summary_{timestamp}.txt', summary)
 
     print("\n" + "="*60)
     print("🏁 ALL TRANSPORTS TEST COMPLETE!")
@@ -295,4 +472,6 @@ RECOMMENDATION:
     print("📄 Check test_outputs/ for detailed results")
 
 if __name__ == "__main__":
+    if UVLOOP_AVAILABLE:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
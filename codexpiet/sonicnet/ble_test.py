@@ -17,21 +17,55 @@ Usage:
 
 import asyncio
 import logging
+import queue
 import sys
 import argparse
+import threading
 import time
 import json
+from collections import OrderedDict, deque
 from datetime import datetime
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
 from typing import Dict, List, Optional
 
 # Add current directory to path
 import os
 sys.path.insert(0, os.getcwd())
 
-from transports.ble import BLEMeshTransport, BLE_AVAILABLE
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from transports.ble import (
+    BLEMeshTransport, BLE_AVAILABLE, DEFAULT_CHUNK_SIZE, MIN_RSSI, NUS_SERVICE, NUS_RX, NUS_TX
+)
 from packet import SOSPacket
 from packet_manager import PacketManager
 
+# Cap on packet history kept by the test so long runs stay bounded
+PACKET_HISTORY_SIZE = 10000
+
+# How many recent packet IDs to remember for dropping mesh-forwarded duplicates
+SEEN_PACKET_CACHE_SIZE = 4096
+
+# Output separators and result icons
+_SEP = "-" * 50
+_DBLSEP = "=" * 60
+STATUS_ICONS = {
+    'SUCCESS': '✅',
+    'FAILED': '❌',
+    'NO_PEERS': '⚠️',
+    'NO_PACKETS': '⚠️',
+    'SEND_ONLY': '🔄',
+    'RECEIVE_ONLY': '🔄',
+    'PARTIAL': '🟡',
+    'SKIPPED': '⏭️'
+}
+
 # Setup detailed logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,25 +73,147 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Per-packet progress output goes through a queue so the event loop only
+# enqueues; a listener thread does the actual stdout writes
+_progress_queue = queue.Queue(-1)
+progress = logging.getLogger(f"{__name__}.progress")
+progress.setLevel(logging.INFO)
+progress.propagate = False
+progress.addHandler(QueueHandler(_progress_queue))
+
+def _truncate(text: str, limit: int) -> str:
+    """Shorten text to limit characters, marking the cut with '...'."""
+    return text if len(text) <= limit else text[:limit] + '...'
+
+def _tagged(tag: str, write):
+    """Wrap an output function so each line is prefixed with [tag]."""
+    def out(line: str):
+        text = line.lstrip('\n')
+        write(f"{line[:len(line) - len(text)]}[{tag}] {text}")
+    return out
+
+def _create_progress_listener() -> QueueListener:
+    """Create the listener that writes queued progress lines to stdout."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return QueueListener(_progress_queue, handler)
+
+class _LoopBridgeQueue:
+    """put_nowait() proxy that hands items to an asyncio.Queue owned by another loop."""
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self._queue = queue
+        self._loop = loop
+
+    def put_nowait(self, item):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
 class BLETransportTest:
     """Comprehensive BLE transport test for two laptops."""
 
-    def __init__(self, device_name: str = "BLE-Test-Device"):
+    def __init__(self, device_name: str = "BLE-Test-Device", chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 min_rssi: int = MIN_RSSI):
         self.device_name = device_name
+        self.chunk_size = chunk_size
+        self.min_rssi = min_rssi
         self.transport = None
+        self._main_loop = None
+        self._ble_loop = None  # Dedicated loop so BLE callbacks never wait behind test output
+        self._ble_thread = None
+        self._relay_task = None
+        self._monitor_task = None
         self.message_queue = asyncio.Queue()
         self.packet_manager = PacketManager()
         self.running = False
-        self.received_packets = []
-        self.sent_packets = []
+        self.packet_received = asyncio.Event()  # Pulsed by the message monitor
+        self.peer_discovered = asyncio.Event()  # Relayed from the transport's loop
+        self.received_packets = deque(maxlen=PACKET_HISTORY_SIZE)
+        self.sent_packets = deque(maxlen=PACKET_HISTORY_SIZE)
+        self._seen_packet_ids = OrderedDict()  # LRU of recently received packet IDs
         self.test_results = {}
+        self._progress_listener = None
+        self._t0 = time.monotonic_ns()  # Packet history times are ns offsets from here
+        self._out_dir = Path('test_outputs')
+        self._out_dir.mkdir(exist_ok=True)
+
+    @staticmethod
+    async def _wait_for_event(event: asyncio.Event, condition, timeout: Optional[float]) -> bool:
+        """Wait on event until condition() holds; returns False on timeout."""
+        async def _wait():
+            while not condition():
+                await event.wait()
+
+        try:
+            await asyncio.wait_for(_wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    @staticmethod
+    async def _report_periodically(report, interval: int = 5):
+        """Await report(elapsed_seconds) every interval seconds until cancelled."""
+        elapsed = 0
+        while True:
+            await report(elapsed)
+            await asyncio.sleep(interval)
+            elapsed += interval
+
+    async def _on_ble_loop(self, coro):
+        """Run a coroutine on the BLE transport loop and await its result."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._ble_loop))
+
+    async def _ble_call(self, fn, *args):
+        """Call a synchronous transport method on the BLE loop, which owns the transport's state."""
+        async def call():
+            return fn(*args)
+        return await self._on_ble_loop(call())
+
+    @staticmethod
+    def _pulse(event: asyncio.Event):
+        """Wake everything currently waiting on event."""
+        event.set()
+        event.clear()
+
+    async def _relay_event(self, source: asyncio.Event, target: asyncio.Event):
+        """Runs on the BLE loop: mirror pulses of source onto target in the main loop."""
+        while True:
+            await source.wait()
+            self._main_loop.call_soon_threadsafe(self._pulse, target)
+
+    async def _start_transport(self):
+        """Runs on the BLE loop: start the transport and its event relay."""
+        await self.transport.start()
+        self._relay_task = asyncio.create_task(
+            self._relay_event(self.transport.peer_discovered, self.peer_discovered)
+        )
+
+    async def _stop_transport(self):
+        """Runs on the BLE loop: stop the event relay and the transport."""
+        if self._relay_task:
+            self._relay_task.cancel()
+            try:
+                await self._relay_task
+            except asyncio.CancelledError:
+                pass
+        await self.transport.stop()
+
+    async def _flush_progress_output(self):
+        """Wait until every queued progress line has been written, leaving the listener running."""
+        if self._progress_listener:
+            await asyncio.get_running_loop().run_in_executor(None, _progress_queue.join)
+
+    def _stop_progress_output(self):
+        """Flush queued progress lines and stop the listener thread."""
+        if self._progress_listener:
+            self._progress_listener.stop()
+            self._progress_listener = None
 
     async def run_test(self):
         """Run comprehensive BLE transport test."""
         print(f"\n🔵 BLE Transport Test for Two Laptops")
         print(f"📱 Device: {self.device_name}")
         print(f"⏰ Started: {datetime.now().strftime('%H:%M:%S')}")
-        print("=" * 60)
+        print(_DBLSEP)
 
         # Check BLE availability first
         if not BLE_AVAILABLE:
@@ -67,6 +223,8 @@ class BLETransportTest:
 
         try:
             self.running = True
+            self._progress_listener = _create_progress_listener()
+            self._progress_listener.start()
 
             # Phase 1: Initialize BLE transport
             await self._phase_1_initialization()
@@ -77,11 +235,13 @@ class BLETransportTest:
             # Phase 3: Test device discovery
             await self._phase_3_device_discovery()
 
-            # Phase 4: Test packet sending
-            await self._phase_4_packet_sending()
-
-            # Phase 5: Test packet receiving
-            await self._phase_5_packet_receiving()
+            # Phases 4 and 5: keep listening while we send, so packets the other
+            # laptop sends during its own phase 4 are caught, then 20 seconds more
+            sending = asyncio.create_task(self._phase_4_packet_sending(out=_tagged('P4', progress.info)))
+            await asyncio.gather(
+                sending,
+                self._phase_5_passive_monitor(out=_tagged('P5', progress.info), until=sending)
+            )
 
             # Phase 6: Bidirectional communication test
             await self._phase_6_bidirectional_test()
@@ -104,25 +264,38 @@ class BLETransportTest:
     async def _phase_1_initialization(self):
         """Phase 1: Initialize BLE transport."""
         print(f"\n📋 PHASE 1: BLE Transport Initialization")
-        print("-" * 50)
+        print(_SEP)
 
         try:
-            # Create BLE transport
-            self.transport = BLEMeshTransport(self.message_queue, self.packet_manager)
+            # Give the transport its own thread and event loop
+            self._main_loop = asyncio.get_running_loop()
+            self._ble_loop = asyncio.new_event_loop()
+            self._ble_thread = threading.Thread(
+                target=self._ble_loop.run_forever, name="ble-transport", daemon=True
+            )
+            self._ble_thread.start()
+
+            # Create BLE transport; received packets are handed back to this loop
+            self.transport = BLEMeshTransport(
+                _LoopBridgeQueue(self.message_queue, self._main_loop),
+                self.packet_manager,
+                chunk_size=self.chunk_size,
+                min_rssi=self.min_rssi
+            )
             print(f"✅ BLE transport created successfully")
 
             # Start background message monitoring
-            asyncio.create_task(self._monitor_messages())
+            self._monitor_task = asyncio.create_task(self._monitor_messages())
 
             # Start the transport
-            await self.transport.start()
-            print(f"✅ BLE transport started")
+            await self._on_ble_loop(self._start_transport())
+            print(f"✅ BLE transport started on dedicated thread")
 
             # Wait for initialization
             await asyncio.sleep(3)
 
             # Check initial stats
-            stats = self.transport.get_transport_stats()
+            stats = await self._ble_call(self.transport.get_transport_stats)
             print(f"\n📊 Initial Stats:")
             print(f"   BLE Available: {'✅' if stats['ble_available'] else '❌'}")
             print(f"   Transport Running: {'✅' if stats['running'] else '❌'}")
@@ -139,7 +312,7 @@ class BLETransportTest:
     async def _phase_2_server_setup(self):
         """Phase 2: Test GATT server setup and advertising."""
         print(f"\n📋 PHASE 2: GATT Server Setup")
-        print("-" * 50)
+        print(_SEP)
 
         try:
             print(f"🔍 Checking GATT server status...")
@@ -147,14 +320,15 @@ class BLETransportTest:
             # Wait for server to start advertising
             await asyncio.sleep(5)
 
-            stats = self.transport.get_transport_stats()
+            stats = await self._ble_call(self.transport.get_transport_stats)
             server_running = stats.get('server_running', False)
 
             if server_running:
                 print(f"✅ GATT server is running and advertising")
-                print(f"📡 Service UUID: 6e400001-b5a3-f393-e0a9-e50e24dcca9e")
-                print(f"📝 RX Characteristic: 6e400002-b5a3-f393-e0a9-e50e24dcca9e")
-                print(f"📤 TX Characteristic: 6e400003-b5a3-f393-e0a9-e50e24dcca9e")
+                print(f"📡 Service UUID: {NUS_SERVICE}")
+                print(f"📝 RX Characteristic: {NUS_RX}")
+                print(f"📤 TX Characteristic: {NUS_TX}")
+                print(f"📦 Chunk size: {self.chunk_size} bytes (capped to peer MTU on send)")
                 print(f"💡 Other devices should now be able to discover this device!")
                 self.test_results['server_setup'] = 'SUCCESS'
             else:
@@ -170,74 +344,76 @@ class BLETransportTest:
             print(f"❌ Server setup failed: {e}")
             self.test_results['server_setup'] = 'FAILED'
 
-    async def _phase_3_device_discovery(self):
+    async def _phase_3_device_discovery(self, out=progress.info):
         """Phase 3: Test BLE device discovery."""
-        print(f"\n📋 PHASE 3: Device Discovery")
-        print("-" * 50)
+        out(f"\n📋 PHASE 3: Device Discovery")
+        out(_SEP)
 
         try:
-            print(f"🔍 Scanning for other SonicWave BLE devices...")
-            print(f"💡 Make sure the other laptop is running this test!")
+            out(f"🔍 Scanning for other SonicWave BLE devices...")
+            out(f"💡 Make sure the other laptop is running this test!")
+            out(f"🔎 Scan filter active: service UUID {NUS_SERVICE} (periodic unfiltered scans for name-only peers), RSSI >= {self.min_rssi} dBm")
 
             initial_peers = len(self.transport.discovered_peers)
-            print(f"   Initial peer count: {initial_peers}")
+            out(f"   Initial peer count: {initial_peers}")
 
-            # Monitor discovery for 30 seconds
-            discovery_timeout = 30
-            for i in range(discovery_timeout):
-                await asyncio.sleep(1)
-
-                current_peers = len(self.transport.discovered_peers)
-                stats = self.transport.get_transport_stats()
+            async def report(elapsed):
+                stats = await self._ble_call(self.transport.get_transport_stats)
                 scans = stats.get('scans_performed', 0)
+                out(f"   [{elapsed:2d}s] Scans: {scans}, Peers: {len(self.transport.discovered_peers)}")
 
-                if i % 5 == 0:  # Update every 5 seconds
-                    print(f"   [{i:2d}s] Scans: {scans}, Peers: {current_peers}")
-
-                # Check if we found any new peers
-                if current_peers > initial_peers:
-                    print(f"🎉 Device discovery successful!")
-                    break
+            # Monitor discovery for 30 seconds, waking as soon as a new peer appears
+            discovery_timeout = 30
+            status_task = asyncio.create_task(self._report_periodically(report))
+            try:
+                if await self._wait_for_event(
+                    self.peer_discovered,
+                    lambda: len(self.transport.discovered_peers) > initial_peers,
+                    discovery_timeout
+                ):
+                    out(f"🎉 Device discovery successful!")
+            finally:
+                status_task.cancel()
 
             # Show discovered peers
             final_peers = len(self.transport.discovered_peers)
-            peers_list = self.transport.get_discovered_peers()
+            peers_list = await self._ble_call(self.transport.get_discovered_peers)
 
-            print(f"\n👥 Discovery Results:")
-            print(f"   Total peers discovered: {final_peers}")
+            out(f"\n👥 Discovery Results:")
+            out(f"   Total peers discovered: {final_peers}")
 
             if peers_list:
-                print(f"   📱 Discovered Devices:")
+                out(f"   📱 Discovered Devices:")
                 for peer in peers_list:
-                    print(f"      🟢 {peer['address']} ({peer['name']})")
-                    print(f"         RSSI: {peer['rssi']}, Last seen: {time.time() - peer['last_seen']:.1f}s ago")
+                    out(f"      🟢 {peer['address']} ({peer['name']})")
+                    out(f"         RSSI: {peer['rssi']}, Last seen: {time.time() - peer['last_seen']:.1f}s ago")
                 self.test_results['discovery'] = 'SUCCESS'
             else:
-                print(f"   📪 No SonicWave devices found")
-                print(f"   💡 Make sure another laptop is running this test")
-                print(f"   💡 Check that both devices have BLE enabled")
+                out(f"   📪 No SonicWave devices found")
+                out(f"   💡 Make sure another laptop is running this test")
+                out(f"   💡 Check that both devices have BLE enabled")
                 self.test_results['discovery'] = 'NO_PEERS'
 
-            stats = self.transport.get_transport_stats()
-            print(f"\n📊 Discovery Stats:")
-            print(f"   Scans performed: {stats.get('scans_performed', 0)}")
-            print(f"   Peers discovered: {stats.get('peers_discovered', 0)}")
-            print(f"   Scan errors: {stats.get('scan_errors', 0)}")
+            stats = await self._ble_call(self.transport.get_transport_stats)
+            out(f"\n📊 Discovery Stats:")
+            out(f"   Scans performed: {stats.get('scans_performed', 0)}")
+            out(f"   Peers discovered: {stats.get('peers_discovered', 0)}")
+            out(f"   Scan errors: {stats.get('scan_errors', 0)}")
 
         except Exception as e:
-            print(f"❌ Discovery failed: {e}")
+            out(f"❌ Discovery failed: {e}")
             self.test_results['discovery'] = 'FAILED'
 
-    async def _phase_4_packet_sending(self):
+    async def _phase_4_packet_sending(self, out=progress.info):
         """Phase 4: Test packet sending to discovered peers."""
-        print(f"\n📋 PHASE 4: Packet Sending Test")
-        print("-" * 50)
+        out(f"\n📋 PHASE 4: Packet Sending Test")
+        out(_SEP)
 
         try:
             # Check if we have any peers to send to
             if not self.transport.discovered_peers:
-                print(f"⚠️ No peers available for sending test")
-                print(f"💡 Discovery phase must find peers first")
+                out(f"⚠️ No peers available for sending test")
+                out(f"💡 Discovery phase must find peers first")
                 self.test_results['sending'] = 'NO_PEERS'
                 return
 
@@ -248,12 +424,12 @@ class BLETransportTest:
                 f"BLE test message #3 - Testing chunked data transmission with a longer message that should be split into multiple BLE MTU-sized chunks to verify the chunking protocol works correctly.",
             ]
 
-            print(f"📤 Sending {len(test_packets)} test packets...")
+            out(f"📤 Sending {len(test_packets)} test packets...")
 
             for i, message in enumerate(test_packets, 1):
-                print(f"\n📨 Sending packet {i}:")
-                print(f"   Message: {message[:50]}{'...' if len(message) > 50 else ''}")
-                print(f"   Length: {len(message)} chars")
+                out(f"\n📨 Sending packet {i}:")
+                out(f"   Message: {_truncate(message, 50)}")
+                out(f"   Length: {len(message)} chars")
 
                 # Create SOS packet
                 packet = SOSPacket(
@@ -263,108 +439,125 @@ class BLETransportTest:
                 )
 
                 # Send packet
-                await self.transport.send(packet)
+                await self._on_ble_loop(self.transport.send(packet, chunk_size=self.chunk_size))
                 self.sent_packets.append({
                     'packet': packet,
-                    'time': datetime.now(),
+                    'time': time.monotonic_ns() - self._t0,
                     'length': len(message)
                 })
 
-                print(f"   ✅ Packet queued: {packet.packet_id[:8]}...")
+                out(f"   ✅ Packet queued: {packet.packet_id[:8]}...")
 
                 # Wait between sends
                 await asyncio.sleep(2)
 
             # Wait for sends to complete
-            print(f"\n⏳ Waiting for packets to be transmitted...")
+            out(f"\n⏳ Waiting for packets to be transmitted...")
             await asyncio.sleep(10)
 
             # Check sending stats
-            stats = self.transport.get_transport_stats()
+            stats = await self._ble_call(self.transport.get_transport_stats)
             packets_sent = stats.get('packets_sent', 0)
             connection_errors = stats.get('connection_errors', 0)
 
-            print(f"\n📊 Sending Results:")
-            print(f"   Packets sent: {packets_sent}")
-            print(f"   Connection errors: {connection_errors}")
-            print(f"   Pending packets: {stats.get('pending_packets', 0)}")
+            out(f"\n📊 Sending Results:")
+            out(f"   Packets sent: {packets_sent}")
+            out(f"   Connection errors: {connection_errors}")
+            out(f"   Pending packets: {stats.get('pending_packets', 0)}")
 
             if packets_sent > 0:
-                print(f"✅ Packet sending successful!")
+                out(f"✅ Packet sending successful!")
                 self.test_results['sending'] = 'SUCCESS'
             else:
-                print(f"❌ No packets were sent")
+                out(f"❌ No packets were sent")
                 self.test_results['sending'] = 'FAILED'
 
         except Exception as e:
-            print(f"❌ Sending test failed: {e}")
+            out(f"❌ Sending test failed: {e}")
             self.test_results['sending'] = 'FAILED'
 
-    async def _phase_5_packet_receiving(self):
-        """Phase 5: Test packet receiving from other devices."""
-        print(f"\n📋 PHASE 5: Packet Receiving Test")
-        print("-" * 50)
+    async def _phase_5_passive_monitor(self, monitoring_time: float = 20, out=progress.info,
+                                       until: Optional[asyncio.Future] = None):
+        """Phase 5: Passively watch for packets from other devices.
+
+        Watches for monitoring_time seconds, counted from when until completes if it is given.
+        """
+        out(f"\n📋 PHASE 5: Packet Receiving Test")
+        out(_SEP)
 
         try:
-            print(f"📥 Monitoring for incoming BLE packets...")
-            print(f"💡 Other devices should send packets to this device")
+            out(f"📥 Monitoring for incoming BLE packets...")
+            out(f"💡 Other devices should send packets to this device")
 
             initial_received = len(self.received_packets)
+            shown = initial_received
 
-            # Monitor for 20 seconds
-            monitoring_time = 20
-            for i in range(monitoring_time):
-                await asyncio.sleep(1)
-
-                current_received = len(self.received_packets)
-                stats = self.transport.get_transport_stats()
+            async def report(elapsed):
+                stats = await self._ble_call(self.transport.get_transport_stats)
                 server_connections = stats.get('server_connections', 0)
+                out(f"   [{elapsed:2d}s] Received: {len(self.received_packets)}, Server connections: {server_connections}")
+
+            # Monitor for the given time, showing packets as soon as they arrive
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + monitoring_time if until is None else None
+            if until is not None:
+                # Wake the wait below when the overlapping phase finishes
+                until.add_done_callback(lambda _: self._pulse(self.packet_received))
 
-                if i % 5 == 0:  # Update every 5 seconds
-                    print(f"   [{i:2d}s] Received: {current_received}, Server connections: {server_connections}")
+            def ready():
+                return len(self.received_packets) > shown or (deadline is None and until.done())
 
-                # Show real-time received packets
-                if current_received > initial_received:
-                    latest_packets = self.received_packets[initial_received:]
-                    for packet_info in latest_packets:
+            status_task = asyncio.create_task(self._report_periodically(report))
+            try:
+                while await self._wait_for_event(
+                    self.packet_received,
+                    ready,
+                    None if deadline is None else deadline - loop.time()
+                ):
+                    for packet_info in islice(self.received_packets, shown, None):
                         packet = packet_info['packet']
-                        print(f"   📨 Received: {packet.packet_id[:8]}... from {packet.sender_id}")
+                        out(f"   📨 Received: {packet.packet_id[:8]}... from {packet.sender_id}")
+                    shown = len(self.received_packets)
+                    if deadline is None and until.done():
+                        deadline = loop.time() + monitoring_time
+            finally:
+                status_task.cancel()
 
             # Show receiving results
             final_received = len(self.received_packets)
             packets_received_count = final_received - initial_received
 
-            print(f"\n📊 Receiving Results:")
-            print(f"   New packets received: {packets_received_count}")
-            print(f"   Total packets received: {final_received}")
+            out(f"\n📊 Receiving Results:")
+            out(f"   New packets received: {packets_received_count}")
+            out(f"   Total packets received: {final_received}")
 
-            stats = self.transport.get_transport_stats()
-            print(f"   Server connections: {stats.get('server_connections', 0)}")
-            print(f"   Buffered chunks: {stats.get('buffered_chunks', 0)}")
+            stats = await self._ble_call(self.transport.get_transport_stats)
+            out(f"   Server connections: {stats.get('server_connections', 0)}")
+            out(f"   Buffered chunks: {stats.get('buffered_chunks', 0)}")
 
             if packets_received_count > 0:
-                print(f"✅ Packet receiving successful!")
+                out(f"✅ Packet receiving successful!")
                 self.test_results['receiving'] = 'SUCCESS'
 
                 # Show received packet details
-                print(f"\n📨 Received Packet Details:")
-                for packet_info in self.received_packets[-packets_received_count:]:
+                out(f"\n📨 Received Packet Details:")
+                for packet_info in islice(self.received_packets, initial_received, None):
                     packet = packet_info['packet']
-                    print(f"   📦 {packet.packet_id[:8]}... from {packet.sender_id[:12]}...")
-                    print(f"      Message: {packet.message[:60]}{'...' if len(packet.message) > 60 else ''}")
+                    out(f"   📦 {packet.packet_id[:8]}... from {_truncate(packet.sender_id, 12)}")
+                    out(f"      Message: {_truncate(packet.message, 60)}")
             else:
-                print(f"⚠️ No packets received")
-                print(f"💡 Make sure other device is sending packets")
+                out(f"⚠️ No packets received")
+                out(f"💡 Make sure other device is sending packets")
                 self.test_results['receiving'] = 'NO_PACKETS'
 
         except Exception as e:
-            print(f"❌ Receiving test failed: {e}")
+            out(f"❌ Receiving test failed: {e}")
             self.test_results['receiving'] = 'FAILED'
 
     async def _phase_6_bidirectional_test(self):
         """Phase 6: Test bidirectional communication."""
         print(f"\n📋 PHASE 6: Bidirectional Communication Test")
-        print("-" * 50)
+        print(_SEP)
 
         try:
             print(f"🔄 Testing bidirectional communication...")
@@ -379,23 +572,27 @@ class BLETransportTest:
             )
 
             print(f"📤 Sending bidirectional test packet...")
-            await self.transport.send(packet)
+            await self._on_ble_loop(self.transport.send(packet, chunk_size=self.chunk_size))
 
             # Monitor for responses
             initial_count = len(self.received_packets)
 
             print(f"📥 Monitoring for bidirectional responses...")
-            for i in range(15):
-                await asyncio.sleep(1)
 
-                current_count = len(self.received_packets)
-                if current_count > initial_count:
-                    new_packets = current_count - initial_count
-                    print(f"   📨 Received {new_packets} new packet(s)!")
-                    break
+            async def report(elapsed):
+                print(f"   [{elapsed:2d}s] Waiting for responses...")
 
-                if i % 5 == 0:
-                    print(f"   [{i:2d}s] Waiting for responses...")
+            status_task = asyncio.create_task(self._report_periodically(report))
+            try:
+                if await self._wait_for_event(
+                    self.packet_received,
+                    lambda: len(self.received_packets) > initial_count,
+                    15
+                ):
+                    new_packets = len(self.received_packets) - initial_count
+                    print(f"   📨 Received {new_packets} new packet(s)!")
+            finally:
+                status_task.cancel()
 
             # Evaluate bidirectional success
             sent_count = len(self.sent_packets)
@@ -424,20 +621,20 @@ class BLETransportTest:
 
     async def _phase_7_stress_test(self):
         """Phase 7: Stress test with multiple rapid packets."""
-        print(f"\n📋 PHASE 7: Stress Test")
-        print("-" * 50)
+        progress.info(f"\n📋 PHASE 7: Stress Test")
+        progress.info(_SEP)
 
         try:
             if not self.transport.discovered_peers:
-                print(f"⚠️ Skipping stress test - no peers available")
+                progress.info(f"⚠️ Skipping stress test - no peers available")
                 self.test_results['stress_test'] = 'SKIPPED'
                 return
 
-            print(f"🚀 Sending rapid-fire packets for stress testing...")
+            progress.info(f"🚀 Sending rapid-fire packets for stress testing...")
 
             stress_packets = []
             for i in range(5):
-                message = f"Stress test packet #{i+1} from {self.device_name} - timestamp {datetime.now().timestamp()}"
+                message = f"Stress test packet #{i+1} from {self.device_name} - timestamp {time.time()}"
                 packet = SOSPacket(
                     sender_id=f"stress_{self.device_name}",
                     message=message,
@@ -448,53 +645,51 @@ class BLETransportTest:
             # Send packets rapidly
             start_time = time.time()
             for i, packet in enumerate(stress_packets):
-                await self.transport.send(packet)
-                print(f"   📤 Sent stress packet {i+1}/5: {packet.packet_id[:8]}...")
+                # Back off while the transport's send queue is saturated
+                if not await self._on_ble_loop(self.transport.wait_for_send_capacity(2.0)):
+                    progress.info(f"   ⏳ Send queue still full after 2s, sending anyway")
+
+                await self._on_ble_loop(self.transport.send(packet, chunk_size=self.chunk_size))
+                progress.info(f"   📤 Sent stress packet {i+1}/5: {packet.packet_id[:8]}...")
                 await asyncio.sleep(0.5)  # Rapid sending
 
             send_time = time.time() - start_time
 
             # Wait for transmission
-            print(f"⏳ Waiting for stress test packets to transmit...")
+            progress.info(f"⏳ Waiting for stress test packets to transmit...")
             await asyncio.sleep(10)
 
-            stats = self.transport.get_transport_stats()
+            stats = await self._ble_call(self.transport.get_transport_stats)
 
-            print(f"\n📊 Stress Test Results:")
-            print(f"   Packets queued: {len(stress_packets)}")
-            print(f"   Total sent: {stats.get('packets_sent', 0)}")
-            print(f"   Send time: {send_time:.2f} seconds")
-            print(f"   Connection errors: {stats.get('connection_errors', 0)}")
+            progress.info(f"\n📊 Stress Test Results:")
+            progress.info(f"   Packets queued: {len(stress_packets)}")
+            progress.info(f"   Total sent: {stats.get('packets_sent', 0)}")
+            progress.info(f"   Send time: {send_time:.2f} seconds")
+            progress.info(f"   Connection errors: {stats.get('connection_errors', 0)}")
 
             if stats.get('packets_sent', 0) >= len(stress_packets):
-                print(f"✅ Stress test passed!")
+                progress.info(f"✅ Stress test passed!")
                 self.test_results['stress_test'] = 'SUCCESS'
             else:
-                print(f"⚠️ Some packets may have failed")
+                progress.info(f"⚠️ Some packets may have failed")
                 self.test_results['stress_test'] = 'PARTIAL'
 
         except Exception as e:
-            print(f"❌ Stress test failed: {e}")
+            progress.info(f"❌ Stress test failed: {e}")
             self.test_results['stress_test'] = 'FAILED'
 
     async def _show_final_results(self):
         """Show final test results and summary."""
+        # Make sure all phase output is written before the summary
+        await self._flush_progress_output()
+
         print(f"\n🎯 FINAL BLE TEST RESULTS")
-        print("=" * 60)
+        print(_DBLSEP)
 
         # Test results summary
         print(f"📊 Test Phase Results:")
         for phase, result in self.test_results.items():
-            status_icon = {
-                'SUCCESS': '✅',
-                'FAILED': '❌',
-                'NO_PEERS': '⚠️',
-                'NO_PACKETS': '⚠️',
-                'SEND_ONLY': '🔄',
-                'RECEIVE_ONLY': '🔄',
-                'PARTIAL': '🟡',
-                'SKIPPED': '⏭️'
-            }.get(result, '❓')
+            status_icon = STATUS_ICONS.get(result, '❓')
 
             print(f"   {status_icon} {phase.title().replace('_', ' ')}: {result}")
 
@@ -503,9 +698,9 @@ class BLETransportTest:
         print(f"   📤 Packets sent: {len(self.sent_packets)}")
         print(f"   📥 Packets received: {len(self.received_packets)}")
 
-        # Transport stats
+        # Transport stats (one snapshot shared with the saved results)
+        stats = await self._ble_call(self.transport.get_transport_stats) if self.transport else {}
         if self.transport:
-            stats = self.transport.get_transport_stats()
             print(f"\n📊 Final Transport Stats:")
             print(f"   Scans performed: {stats.get('scans_performed', 0)}")
             print(f"   Peers discovered: {stats.get('peers_discovered', 0)}")
@@ -528,44 +723,54 @@ class BLETransportTest:
             print(f"❌ BLE transport needs attention ({success_count}/{total_tests} tests passed)")
 
         # Save test results
-        await self._save_test_results()
+        await self._save_test_results(stats)
 
     async def _monitor_messages(self):
         """Background task to monitor incoming messages."""
         while self.running:
             try:
-                if not self.message_queue.empty():
-                    try:
-                        while not self.message_queue.empty():
-                            packet = await asyncio.wait_for(
-                                self.message_queue.get(),
-                                timeout=0.1
-                            )
-
-                            self.received_packets.append({
-                                'packet': packet,
-                                'time': datetime.now()
-                            })
-
-                            print(f"\n📨 RECEIVED BLE PACKET: {packet.packet_id[:8]}... from {packet.sender_id[:12]}...")
-
-                    except asyncio.TimeoutError:
-                        pass
+                packet = await self.message_queue.get()
+                if packet is None:
+                    # Shutdown sentinel from _cleanup
+                    break
+                self._record_received_packet(packet)
 
-                await asyncio.sleep(0.2)
+                # Drain the rest of a burst without yielding to the loop
+                while not self.message_queue.empty():
+                    packet = self.message_queue.get_nowait()
+                    if packet is None:
+                        return
+                    self._record_received_packet(packet)
 
             except Exception as e:
                 logger.error(f"Error in message monitor: {e}")
                 await asyncio.sleep(1)
 
-    async def _save_test_results(self):
+    def _record_received_packet(self, packet: SOSPacket):
+        """Store and report a packet taken off the message queue."""
+        # The same packet can arrive several times via mesh forwarding
+        if packet.packet_id in self._seen_packet_ids:
+            return
+        self._seen_packet_ids[packet.packet_id] = None
+        if len(self._seen_packet_ids) > SEEN_PACKET_CACHE_SIZE:
+            self._seen_packet_ids.popitem(last=False)
+
+        self.received_packets.append({
+            'packet': packet,
+            'time': time.monotonic_ns() - self._t0
+        })
+
+        progress.info(f"\n📨 RECEIVED BLE PACKET: {packet.packet_id[:8]}... from {_truncate(packet.sender_id, 12)}")
+
+        # Wake any phase waiting on new packets
+        self.packet_received.set()
+        self.packet_received.clear()
+
+    async def _save_test_results(self, stats: Optional[Dict] = None):
         """Save test results to file."""
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"test_outputs/ble_test_{timestamp}.json"
-
-            # Ensure directory exists
-            os.makedirs('test_outputs', exist_ok=True)
+            filename = self._out_dir / f"ble_test_{timestamp}.json"
 
             results_data = {
                 'test_info': {
@@ -578,12 +783,19 @@ class BLETransportTest:
                     'packets_sent': len(self.sent_packets),
                     'packets_received': len(self.received_packets)
                 },
-                'transport_stats': self.transport.get_transport_stats() if self.transport else {},
-                'discovered_peers': self.transport.get_discovered_peers() if self.transport else []
+                'transport_stats': stats if stats is not None else (
+                    await self._ble_call(self.transport.get_transport_stats) if self.transport else {}
+                ),
+                'discovered_peers': await self._ble_call(self.transport.get_discovered_peers) if self.transport else []
             }
 
-            with open(filename, 'w') as f:
-                json.dump(results_data, f, indent=2, default=str)
+            if ORJSON_AVAILABLE:
+                payload = orjson.dumps(results_data, option=orjson.OPT_INDENT_2, default=str)
+            else:
+                payload = json.dumps(results_data, indent=2, default=str).encode('utf-8')
+
+            # Write off the event loop so the message monitor keeps running
+            await asyncio.get_running_loop().run_in_executor(None, filename.write_bytes, payload)
 
             print(f"\n💾 Test results saved to: {filename}")
 
@@ -592,22 +804,48 @@ class BLETransportTest:
 
     async def _cleanup(self):
         """Clean up resources."""
+        await self._flush_progress_output()
         print(f"\n🧹 Cleaning up...")
         self.running = False
 
+        # Let the message monitor drain and exit, cancelling it if it doesn't
+        if self._monitor_task:
+            self.message_queue.put_nowait(None)
+            await asyncio.wait({self._monitor_task}, timeout=1.0)
+            if not self._monitor_task.done():
+                self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+
         if self.transport:
             try:
-                await self.transport.stop()
+                await self._on_ble_loop(self._stop_transport())
                 print(f"✅ BLE transport stopped")
             except Exception as e:
                 print(f"❌ Error stopping transport: {e}")
 
+        if self._ble_loop:
+            self._ble_loop.call_soon_threadsafe(self._ble_loop.stop)
+            await asyncio.to_thread(self._ble_thread.join, 5)
+            if not self._ble_loop.is_running():
+                self._ble_loop.close()
+
+        # Stop progress output last so lines logged during cleanup are still written
+        self._stop_progress_output()
+
 async def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(description='BLE Transport Test for Two Laptops')
     parser.add_argument('--device', '-d',
                        help='Device name for identification',
                        default=f"BLE-Test-{datetime.now().strftime('%H%M%S')}")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                       help=f'BLE write chunk size in bytes (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--min-rssi', type=int, default=MIN_RSSI,
+                       help=f'Ignore adverts weaker than this many dBm (default: {MIN_RSSI})')
 
     args = parser.parse_args()
 
@@ -620,7 +858,7 @@ async def main():
     print(f"   4. Watch for device discovery and communication")
     print()
 
-    test = BLETransportTest(device_name=args.device)
+    test = BLETransportTest(device_name=args.device, chunk_size=args.chunk_size, min_rssi=args.min_rssi)
     await test.run_test()
 
 if __name__ == "__main__":
@@ -8,9 +8,10 @@ import logging
 import uuid
 import sys
 import signal
+from collections import deque, OrderedDict
 
 from packet import SOSPacket, GPSLocation
-from packet_manager import PacketManager
+from packet_manager import PacketManager, PacketValidationError, validate_packet
 from server_uploader import ServerUploader
 from transports.udp_transport import UDPTransport
 from transports.ble_transport import BLETransport
@@ -19,22 +20,126 @@ from location_service import LocationService
 
 logger = logging.getLogger(__name__)
 
+# Most packets handled per wakeup of the message processing loop
+MESSAGE_BATCH_SIZE = 64
+# Recently seen packet IDs kept for duplicate filtering
+SEEN_PACKET_CACHE_SIZE = 4096
+
+class PacketInbox:
+    """
+    Deque-backed packet inbox that transports post into and the client drains in batches.
+    Keeps the asyncio.Queue methods that transports and test scripts already call.
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self._items = deque(maxlen=maxlen)  # Oldest packets are dropped when full
+        self._event = asyncio.Event()
+        self._loop = None  # Loop of the consumer, bound on first wait
+        self.dropped = 0  # Packets pushed out because the inbox was full
+
+    def post(self, packet):
+        """
+        Add a packet and wake the consumer. Safe to call from any thread.
+        When the inbox is full the oldest waiting packet is dropped and counted.
+        """
+        items = self._items
+        if len(items) == items.maxlen:
+            self.dropped += 1
+            logger.warning(f"Message inbox full, dropping oldest packet ({self.dropped} dropped so far)")
+        items.append(packet)
+        self.wake()
+
+    def wake(self):
+        """Wake the consumer, even if no packets are waiting."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if self._loop is None or running_loop is self._loop:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self):
+        """Wait until packets are available or wake() is called."""
+        if self._items:
+            return
+        self._loop = asyncio.get_running_loop()
+        await self._event.wait()
+
+    def drain(self, limit: int = MESSAGE_BATCH_SIZE) -> list:
+        """Remove and return up to limit waiting packets, oldest first."""
+        items = self._items
+        batch = [items.popleft() for _ in range(min(limit, len(items)))]
+        if not items:
+            self._event.clear()
+        return batch
+
+    # asyncio.Queue-compatible interface
+    async def put(self, packet):
+        self.post(packet)
+
+    def put_nowait(self, packet):
+        self.post(packet)
+
+    async def get(self):
+        while not self._items:
+            self._event.clear()
+            await self.wait()
+        return self.get_nowait()
+
+    def get_nowait(self):
+        if not self._items:
+            raise asyncio.QueueEmpty
+        return self._items.popleft()
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def qsize(self) -> int:
+        return len(self._items)
+
 class SonicWaveClient:
     """The main client class, orchestrating all parts of the application."""
 
+    __slots__ = (
+        'node_id', 'packet_manager', 'server_uploader', 'location_service',
+        'message_queue', 'transports', '_transport_names', '_active_transports', '_transport_mask',
+        'running',
+        '_n_sent', '_n_recv', '_n_active', '_n_errors',
+        '_shutdown', '_msg_task', '_seen_ids'
+    )
+
     def __init__(self):
         self.node_id = f"node_{uuid.uuid4().hex[:8]}"
         self.packet_manager = PacketManager()
         self.server_uploader = ServerUploader(self.packet_manager)
         self.location_service = LocationService()
-        self.message_queue = asyncio.Queue(maxsize=100)  # Prevent memory issues
+        self.message_queue = PacketInbox(maxlen=1000)  # Bounded to prevent memory issues
         self.transports = []
+        self._transport_names = ()  # Display names, parallel to self.transports
+        self._active_transports = ()  # Running transports, rebuilt on start/stop
+        self._transport_mask = 0  # Bit i set while self.transports[i] is running
         self.running = False
-        self.stats = {
-            'messages_sent': 0,
-            'messages_received': 0,
-            'transports_active': 0,
-            'errors': 0
+        self._shutdown = asyncio.Event()  # Set once by stop() to end the message loop
+        self._msg_task = None
+        self._seen_ids = OrderedDict()  # LRU of packet IDs already handled
+        # Plain int counters; the stats property builds the dict view on demand
+        self._n_sent = 0
+        self._n_recv = 0
+        self._n_active = 0
+        self._n_errors = 0
+
+    @property
+    def stats(self):
+        """Client counters as a dict."""
+        return {
+            'messages_sent': self._n_sent,
+            'messages_received': self._n_recv,
+            'transports_active': self._n_active,
+            'errors': self._n_errors,
+            'inbox_dropped': self.message_queue.dropped
         }
 
     async def start(self):
@@ -53,6 +158,7 @@ class SonicWaveClient:
                 logger.warning(f"Could not set ProactorEventLoop: {e}")
 
         self.running = True
+        self._shutdown.clear()
 
         try:
             # Initialize location service
@@ -68,30 +174,51 @@ class SonicWaveClient:
             # Start server uploader
             await self.server_uploader.start()
 
-            # Start transports
-            for transport in self.transports:
-                try:
-                    await transport.start()
-                    self.stats['transports_active'] += 1
-                    logger.info(f"Started {type(transport).__name__}")
-                except Exception as e:
-                    logger.error(f"Failed to start {type(transport).__name__}: {e}")
-                    self.stats['errors'] += 1
+            # Start transports together so slow BLE discovery doesn't hold up UDP and GGWave
+            await asyncio.gather(*(self._safe_start(t) for t in self.transports))
+            self._refresh_active_transports()
 
-            # Start the main message processing loop
-            asyncio.create_task(self._process_messages())
-            logger.info(f"SonicWave client started with {self.stats['transports_active']} active transports")
+            # Start the main message processing loop, running it eagerly up to its first wait
+            loop = asyncio.get_running_loop()
+            if sys.version_info >= (3, 12):
+                self._msg_task = asyncio.Task(self._process_messages(), loop=loop, eager_start=True)
+            else:
+                self._msg_task = loop.create_task(self._process_messages())
+            logger.info("SonicWave client started with %d active transports", self._n_active)
 
         except Exception as e:
             logger.error(f"Failed to start SonicWave client: {e}")
-            self.stats['errors'] += 1
+            self._n_errors += 1
             raise
 
+    async def _safe_start(self, transport):
+        """Start one transport, counting the outcome instead of raising."""
+        try:
+            await transport.start()
+            self._n_active += 1
+            logger.info("Started %s", transport._display_name)
+        except Exception as e:
+            logger.error(f"Failed to start {transport._display_name}: {e}")
+            self._n_errors += 1
+
     async def stop(self):
         """Stops the client and all components gracefully."""
         logger.info("Stopping SonicWave client...")
         self.running = False
 
+        # Signal shutdown and wake the message processing loop exactly once
+        self._shutdown.set()
+        self.message_queue.wake()
+
+        # Cancel the message task in case it is stuck mid-batch
+        if self._msg_task is not None:
+            self._msg_task.cancel()
+            try:
+                await self._msg_task
+            except asyncio.CancelledError:
+                pass
+            self._msg_task = None
+
         # Stop location service
         try:
             await self.location_service.stop()
@@ -108,84 +235,119 @@ class SonicWaveClient:
         for transport in self.transports:
             try:
                 await transport.stop()
-                logger.info(f"Stopped {type(transport).__name__}")
+                logger.info(f"Stopped {transport._display_name}")
             except Exception as e:
-                logger.error(f"Error stopping {type(transport).__name__}: {e}")
-                self.stats['errors'] += 1
+                logger.error(f"Error stopping {transport._display_name}: {e}")
+                self._n_errors += 1
+        self._refresh_active_transports()
 
         logger.info("SonicWave client stopped")
 
     async def _initialize_transports(self):
         """Initialize all transport mechanisms with new models."""
-        # Initialize transports with new models
-        try:
-            # Create UDP transport with separate sender/receiver
-            udp_transport = UDPTransport(self.message_queue, self.node_id)
-            self.transports.append(udp_transport)
-            logger.info("UDP transport initialized")
-        except Exception as e:
-            logger.error(f"Failed to initialize UDP transport: {e}")
-            self.stats['errors'] += 1
-
-        try:
-            # Create BLE transport with separate sender/receiver
-            ble_transport = BLETransport(self.message_queue, self.node_id)
-            self.transports.append(ble_transport)
-            logger.info("BLE transport initialized")
-        except Exception as e:
-            logger.error(f"Failed to initialize BLE transport: {e}")
-            self.stats['errors'] += 1
-
-        try:
-            # Create GGWave transport with separate sender/receiver
-            ggwave_transport = GGWaveTransport(self.message_queue, self.node_id)
-            self.transports.append(ggwave_transport)
-            logger.info("GGWave transport initialized")
-        except Exception as e:
-            logger.error(f"Failed to initialize GGWave transport: {e}")
-            self.stats['errors'] += 1
+        # Construct the transports in worker threads so a slow BLE stack doesn't block the loop
+        loop = asyncio.get_running_loop()
+        transport_types = (
+            ("UDP", UDPTransport),
+            ("BLE", BLETransport),
+            ("GGWave", GGWaveTransport),
+        )
+        results = await asyncio.gather(
+            *(loop.run_in_executor(None, ctor, self.message_queue, self.node_id)
+              for _, ctor in transport_types),
+            return_exceptions=True
+        )
+
+        # Register in a fixed order so transport indices stay stable
+        for (label, _), result in zip(transport_types, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to initialize {label} transport: {result}")
+                self._n_errors += 1
+            else:
+                self._register_transport(result)
+                logger.info(f"{label} transport initialized")
+
+    def _register_transport(self, transport):
+        """Add a transport and cache its display name."""
+        transport._display_name = type(transport).__name__
+        self.transports.append(transport)
+        self._transport_names += (transport._display_name,)
+
+    def _refresh_active_transports(self):
+        """Rebuild the running-transport tuple and availability mask used by send_message."""
+        self._active_transports = tuple(t for t in self.transports if t.running)
+        mask = 0
+        for index, transport in enumerate(self.transports):
+            if transport.running:
+                mask |= 1 << index
+        self._transport_mask = mask
+
+    def post(self, packet: SOSPacket):
+        """Hand a received packet to the client. Safe to call from any thread."""
+        self.message_queue.post(packet)
 
     async def _process_messages(self):
         """Process incoming messages from all transports."""
         logger.info("Starting message processing loop")
 
-        while self.running:
+        while not self._shutdown.is_set():
             try:
-                # Get message from queue with timeout to allow checking running state
-                try:
-                    packet = await asyncio.wait_for(self.message_queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    continue
-
-                # Process the received packet
-                try:
-                    # Skip packets from self
-                    if packet.sender_id == self.node_id:
-                        logger.debug(f"Skipping packet from self: {packet.packet_id[:8]}...")
+                # Sleep until transports post packets, then take a whole batch
+                await self.message_queue.wait()
+                batch = self.message_queue.drain(MESSAGE_BATCH_SIZE)
+
+                if self._shutdown.is_set():
+                    break
+
+                # Transports drop our own packets on receipt; skip ones relays echoed back
+                fresh = []
+                local_err = 0  # Flushed to self._n_errors once per batch
+                log_packets = logger.isEnabledFor(logging.INFO)
+                for packet in batch:
+                    try:
+                        validate_packet(packet)
+                    except PacketValidationError as e:
+                        logger.debug("Dropping invalid packet: %s", e)
+                        local_err += 1
                         continue
-
-                    logger.info(f"Processing packet {packet.packet_id[:8]}... from {packet.sender_id[:8]}...")
-
-                    # Add to packet manager
-                    if self.packet_manager.add_packet(packet):
-                        self.stats['messages_received'] += 1
-
-                    # Mark task as done
-                    self.message_queue.task_done()
-
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
-                    self.stats['errors'] += 1
+                    if not self._mark_seen(packet.packet_id):
+                        continue
+                    if log_packets:
+                        logger.info("Processing packet %s... from %s...", packet.short_id, packet.sender_short)
+                    fresh.append(packet)
+
+                # Hand the whole batch to the packet manager in one call
+                local_recv = 0
+                if fresh:
+                    try:
+                        local_recv = self.packet_manager.add_batch(fresh)
+                    except Exception as e:
+                        logger.error(f"Error processing messages: {e}")
+                        local_err += 1
+
+                self._n_recv += local_recv
+                self._n_errors += local_err
 
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in message processing loop: {e}")
-                self.stats['errors'] += 1
+                self._n_errors += 1
                 await asyncio.sleep(1)
 
         logger.info("Message processing loop stopped")
 
+    def _mark_seen(self, packet_id: str) -> bool:
+        """Record a packet ID as seen. Returns False if it was already seen."""
+        seen = self._seen_ids
+        if packet_id in seen:
+            seen.move_to_end(packet_id)
+            return False
+        seen[packet_id] = None
+        if len(seen) > SEEN_PACKET_CACHE_SIZE:
+            seen.popitem(last=False)
+        return True
+
     async def send_message(self, message: str, location: GPSLocation = None, recipient_id: str = None):
         """
         Send a message through all available transports.
@@ -196,37 +358,47 @@ class SonicWaveClient:
             recipient_id: Target recipient ID (optional, None for broadcast)
         """
         try:
-            # Create packet
+            # Create packet (packets are always broadcast; recipient_id is not carried yet)
             packet = SOSPacket(
                 message=message,
                 location=location,
-                sender_id=self.node_id,
-                recipient_id=recipient_id
+                sender_id=self.node_id
             )
 
-            # Add to packet manager
+            # Add to packet manager and remember it so relayed copies are dropped
             self.packet_manager.add_packet(packet)
+            self._mark_seen(packet.packet_id)
 
-            # Send through all transports
-            for transport in self.transports:
-                if transport.running:
-                    await transport.send(packet)
+            # Nothing to send over; the packet stays cached for the server uploader
+            if not self._transport_mask:
+                logger.warning(f"No transports running, packet {packet.short_id}... only cached")
+                return packet
 
-            self.stats['messages_sent'] += 1
-            logger.info(f"Sent message with ID {packet.packet_id[:8]}...")
+            # Send through all transports at once so slow ones (GGWave) don't hold up the rest
+            results = await asyncio.gather(
+                *(transport.send(packet) for transport in self._active_transports),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Transport send failed: {result}")
+                    self._n_errors += 1
+
+            self._n_sent += 1
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Sent message with ID %s...", packet.short_id)
             return packet
 
         except Exception as e:
             logger.error(f"Error sending message: {e}")
-            self.stats['errors'] += 1
+            self._n_errors += 1
             return None
 
     def get_status(self):
         """Get overall client status information."""
         transport_stats = {}
 
-        for transport in self.transports:
-            transport_name = type(transport).__name__
+        for transport_name, transport in zip(self._transport_names, self.transports):
             if hasattr(transport, 'get_stats'):
                 transport_stats[transport_name] = transport.get_stats()
 
@@ -235,5 +407,5 @@ class SonicWaveClient:
             'running': self.running,
             'stats': self.stats,
             'transports': transport_stats,
-            'packet_manager': self.packet_manager.get_status()
+            'packet_manager': self.packet_manager.get_network_stats()
         }
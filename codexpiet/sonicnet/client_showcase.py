@@ -24,10 +24,25 @@ import argparse
 import time
 import random
 import json
-import requests
+import itertools
+from collections import Counter, deque
+from dataclasses import dataclass
 from datetime import datetime
+from enum import IntEnum
 from typing import Dict, List
 
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False  # Not available on Windows; the default loop is used
+
 # Add current directory to path
 import os
 sys.path.insert(0, os.getcwd())
@@ -42,27 +57,105 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds of send/receive timestamps kept for the "recent activity" counts
+RECENT_WINDOW = 10
+# A peer counts as active if heard from within this many seconds
+PEER_ACTIVE_WINDOW = 30
+# Phase 6 sends one status update every PHASE_6_INTERVAL seconds
+PHASE_6_ROUNDS = 5
+PHASE_6_INTERVAL = 3
+# Most sent/received messages kept in memory; older ones are dropped
+MESSAGE_HISTORY_SIZE = 2048
+# Server receipt checks: IDs per lookup, seconds to let the uploader forward them,
+# and how many recent server packets one lookup fetches
+CONFIRM_BATCH_SIZE = 16
+CONFIRM_DELAY = 2
+CONFIRM_LOOKUP_LIMIT = 100
+
+# Phase 1 demo locations: (lat, lon, city); keep exactly 4 so device_id & 3 indexes it
+_DEMO_LOCS = (
+    (40.7128, -74.0060, "New York City"),
+    (34.0522, -118.2437, "Los Angeles"),
+    (41.8781, -87.6298, "Chicago"),
+    (29.7604, -95.3698, "Houston"),
+)
+
+# Phase 3 scenarios: (message, urgency); each device picks one by its ID
+_EMERGENCY_SCENARIOS = (
+    ("🚗 Car accident on highway - need immediate assistance!", "CRITICAL"),
+    ("🥾 Lost hiker in mountain trail - send help", "HIGH"),
+    ("🏥 Medical emergency - person unconscious", "CRITICAL"),
+    ("🔧 Vehicle breakdown in remote area", "MEDIUM"),
+    ("👀 Witnessing suspicious activity", "LOW"),
+)
+
+# Phase 4 scenarios: (message, location_type, location_data)
+_LOCATION_SCENARIOS = (
+    ("🏢 Emergency at specific coordinates", "coordinates", (40.7589, -73.9851)),
+    ("🌳 Help needed at landmark", "text", "Central Park, near Bethesda Fountain"),
+    ("🚦 Accident at intersection", "text", "5th Avenue and 42nd Street"),
+    ("📍 Emergency at GPS location", "gps", None),  # Will use current/mock GPS
+)
+
+class MsgType(IntEnum):
+    """Kinds of messages the showcase sends."""
+    DISCOVERY = 0
+    EMERGENCY = 1
+    LOCATION_EMERGENCY = 2
+    MESH_TEST = 3
+    STATUS_UPDATE = 4
+
+@dataclass
+class PeerInfo:
+    """A peer heard from during the showcase."""
+    __slots__ = ('first_seen', 'last_seen', 'message_count', 'prefix')
+
+    first_seen: float
+    last_seen: float
+    message_count: int
+    prefix: str  # First 8 chars of the sender ID, for display
+
 class SonicWaveShowcase:
     """Comprehensive showcase of SonicWave emergency communication capabilities."""
 
-    def __init__(self, device_id: int = None):
+    def __init__(self, device_id: int = None, verbose: bool = True):
         self.device_id = device_id or random.randint(1, 100)
         self.device_name = f"Device-{self.device_id}"
         self.client = None
         self.server_url = "http://localhost:8000"
         self.showcase_scenarios = []
         self.discovered_peers = {}
-        self.received_messages = []
-        self.sent_messages = []
+        self.received_messages = deque(maxlen=MESSAGE_HISTORY_SIZE)
+        self.sent_messages = deque(maxlen=MESSAGE_HISTORY_SIZE)
+        self._received_total = 0  # Lifetime counts; the deques above are bounded
+        self._sent_total = 0
+        self._sent_counts = Counter()  # MsgType -> messages sent
+        # Sliding windows of monotonic timestamps; old entries are evicted from the left
+        self._recent_sent = deque()
+        self._recent_received = deque()
+        self._peer_activity = deque()  # (timestamp, sender_id)
         self.running = False
+        self._verbose = verbose  # False with --quiet: status lines go to the debug log
+        self._http = None  # Shared aiohttp session, created on first server request
+        self._monitor_task = None
+        # Packet IDs waiting for a server receipt check, handled by _confirmer
+        self._confirm_q = asyncio.Queue()
+        self._confirmer_task = None
+        self._confirmed = 0
+        self._unconfirmed = 0
+        # Phase headers are formatted from one template and written in a single call
+        self._phase_tmpl = f"\n📋 PHASE {{n}}: {{title}} ({self.device_name})\n{'-' * 50}"
+        self._node_prefix = ""  # First 8 chars of our node ID, set once the client exists
 
     async def run_showcase(self):
         """Run the complete SonicWave showcase demonstration."""
-        print("🚀" + "=" * 60)
-        print(f"   SonicWave Emergency Communication Showcase")
-        print(f"   Device: {self.device_name}")
-        print(f"   Time: {datetime.now()}")
-        print("🚀" + "=" * 60)
+        self._out(
+            "🚀" + "=" * 60,
+            f"   SonicWave Emergency Communication Showcase",
+            f"   Device: {self.device_name}",
+            f"   Time: {datetime.now()}",
+            "🚀" + "=" * 60
+        )
 
         try:
             self.running = True
@@ -101,133 +194,147 @@ class SonicWaveShowcase:
             self.running = False
             await self._cleanup()
 
+    def _out(self, *lines: str):
+        """Show status lines with one stdout write, or log them at debug level when not verbose."""
+        if self._verbose:
+            sys.stdout.write("\n".join(lines) + "\n")
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("\n".join(lines))
+
+    def _write_phase_header(self, n: int, title: str):
+        """Print a phase banner with one write."""
+        self._out(self._phase_tmpl.format(n=n, title=title))
+
     async def _phase_1_initialization(self):
         """Phase 1: Initialize and test all transport systems."""
-        print(f"\n📋 PHASE 1: System Initialization ({self.device_name})")
-        print("-" * 50)
+        self._write_phase_header(1, "System Initialization")
 
         # Create and start client
         self.client = SonicWaveClient()
-        print(f"📱 Created SonicWave client: {self.client.node_id}")
-
-        # Test server connectivity
-        await self._test_server_connection()
+        self._node_prefix = self.client.node_id[:8]
+        self._out(f"📱 Created SonicWave client: {self.client.node_id}")
 
         # Start the client
         await self.client.start()
-        print(f"✅ Client started successfully")
+        self._out(f"✅ Client started successfully")
 
         # Start message monitoring
-        asyncio.create_task(self._monitor_messages())
+        self._monitor_task = asyncio.create_task(self._monitor_messages())
+        self._confirmer_task = asyncio.create_task(self._confirmer())
+
+        # Server, transport and location checks are independent; run them together
+        _, transport_results, location_info = await asyncio.gather(
+            self._test_server_connection(),
+            self.client.test_transports(),
+            self.client.get_current_location_info()
+        )
 
         # Test all transports
-        print(f"\n🔍 Testing Transport Systems:")
-        transport_results = await self.client.test_transports()
+        self._out(f"\n🔍 Testing Transport Systems:")
 
         for transport_name, result in transport_results.items():
             if result.get('available'):
                 status = "🟢 ACTIVE" if result.get('running') else "🟡 AVAILABLE"
-                print(f"   {status} {transport_name}")
+                self._out(f"   {status} {transport_name}")
                 if 'scans_performed' in result:
-                    print(f"      └─ Scans: {result.get('scans_performed', 0)}")
+                    self._out(f"      └─ Scans: {result.get('scans_performed', 0)}")
                 if 'peers_discovered' in result:
-                    print(f"      └─ Peers: {result.get('peers_discovered', 0)}")
+                    self._out(f"      └─ Peers: {result.get('peers_discovered', 0)}")
             else:
-                print(f"   🔴 UNAVAILABLE {transport_name}: {result.get('error', 'Unknown error')}")
+                self._out(f"   🔴 UNAVAILABLE {transport_name}: {result.get('error', 'Unknown error')}")
 
         # Test location services
-        print(f"\n🌍 Testing Location Services:")
-        location_info = await self.client.get_current_location_info()
+        self._out(f"\n🌍 Testing Location Services:")
         if location_info.get('available'):
-            print(f"   ✅ GPS/Location: Available")
-            print(f"      └─ {location_info.get('formatted', 'Unknown format')}")
+            self._out(
+                f"   ✅ GPS/Location: Available",
+                f"      └─ {location_info.get('formatted', 'Unknown format')}"
+            )
         else:
-            print(f"   ⚠️  GPS/Location: {location_info.get('reason', 'Not available')}")
+            self._out(f"   ⚠️  GPS/Location: {location_info.get('reason', 'Not available')}")
             # Set mock location for demo
-            demo_locations = [
-                (40.7128, -74.0060, "New York City"),
-                (34.0522, -118.2437, "Los Angeles"),
-                (41.8781, -87.6298, "Chicago"),
-                (29.7604, -95.3698, "Houston")
-            ]
-            lat, lon, city = demo_locations[self.device_id % len(demo_locations)]
+            lat, lon, city = _DEMO_LOCS[self.device_id & 3]
             self.client.set_mock_location(lat, lon)
-            print(f"   📍 Set demo location: {city}")
+            self._out(f"   📍 Set demo location: {city}")
 
         stats = self.client.get_stats()
-        print(f"\n📊 Initial Stats:")
-        print(f"   Active Transports: {stats['client']['transports_active']}")
-        print(f"   Node ID: {self.client.node_id}")
-        print(f"   Queue Size: {stats['queue_size']}")
+        self._out(
+            f"\n📊 Initial Stats:",
+            f"   Active Transports: {stats['client']['transports_active']}",
+            f"   Node ID: {self.client.node_id}",
+            f"   Queue Size: {stats['queue_size']}"
+        )
 
         await asyncio.sleep(3)
 
     async def _phase_2_device_discovery(self):
         """Phase 2: Demonstrate device discovery capabilities."""
-        print(f"\n📋 PHASE 2: Device Discovery Demo ({self.device_name})")
-        print("-" * 50)
+        self._write_phase_header(2, "Device Discovery Demo")
 
-        print(f"🔍 Broadcasting discovery signals...")
-        print(f"💡 This will help other devices discover this one!")
-        print(f"🎯 If you have another instance running, they should discover each other!")
+        self._out(
+            f"🔍 Broadcasting discovery signals...",
+            f"💡 This will help other devices discover this one!",
+            f"🎯 If you have another instance running, they should discover each other!"
+        )
 
-        # Send multiple discovery messages
-        for i in range(3):
-            discovery_msg = f"Discovery beacon {i+1} from {self.device_name} - Node ID: {self.client.node_id[:8]}"
-            packet_id = await self.client.send_sos(
-                message=discovery_msg,
-                urgency="LOW"
-            )
+        # Send all discovery messages at once
+        discovery_msgs = [
+            f"Discovery beacon {i+1} from {self.device_name} - Node ID: {self._node_prefix}"
+            for i in range(3)
+        ]
+        packet_ids = await asyncio.gather(
+            *(self.client.send_sos(message=msg, urgency="LOW") for msg in discovery_msgs),
+            return_exceptions=True
+        )
 
-            if packet_id:
-                print(f"   📡 Discovery signal {i+1} sent: {packet_id[:8]}...")
-                self.sent_messages.append({
-                    'type': 'DISCOVERY',
+        sent_at = time.monotonic()
+        for i, (discovery_msg, packet_id) in enumerate(zip(discovery_msgs, packet_ids)):
+            if isinstance(packet_id, Exception):
+                print(f"   ❌ Discovery signal {i+1} failed: {packet_id}")
+            elif packet_id:
+                self._out(f"   📡 Discovery signal {i+1} sent: {packet_id[:8]}...")
+                self._record_sent({
+                    'type': MsgType.DISCOVERY,
                     'message': discovery_msg,
                     'packet_id': packet_id,
-                    'time': datetime.now()
+                    'time': sent_at
                 })
 
-            await asyncio.sleep(2)
-
         # Wait for responses and show discovered peers
-        print(f"\n⏳ Waiting for peer discovery responses...")
+        self._out(f"\n⏳ Waiting for peer discovery responses...")
         await asyncio.sleep(8)
 
-        print(f"\n👥 Discovery Results:")
+        self._out(f"\n👥 Discovery Results:")
         if self.discovered_peers:
-            print(f"   🎉 Discovered {len(self.discovered_peers)} peer(s)!")
+            self._out(f"   🎉 Discovered {len(self.discovered_peers)} peer(s)!")
             for peer_id, peer_info in self.discovered_peers.items():
-                print(f"      🟢 {peer_id[:8]}... (Messages: {peer_info['message_count']})")
-                print(f"         └─ Last seen: {(datetime.now() - peer_info['last_seen']).seconds}s ago")
+                self._out(
+                    f"      🟢 {peer_info.prefix}... (Messages: {peer_info.message_count})",
+                    f"         └─ Last seen: {int(time.monotonic() - peer_info.last_seen)}s ago"
+                )
         else:
-            print(f"   📪 No peers discovered yet")
-            print(f"   💡 Start another instance with: python client_showcase.py --device Device-B")
-            print(f"   💡 They should automatically discover each other!")
+            self._out(
+                f"   📪 No peers discovered yet",
+                f"   💡 Start another instance with: python client_showcase.py --device Device-B",
+                f"   💡 They should automatically discover each other!"
+            )
 
-        print(f"\n📨 Messages received so far: {len(self.received_messages)}")
+        self._out(f"\n📨 Messages received so far: {self._received_total}")
         if self.received_messages:
-            for msg in self.received_messages[-3:]:  # Show last 3
-                print(f"   📨 From {msg['sender_id'][:8]}...: {msg['message'][:50]}...")
+            recent = itertools.islice(self.received_messages, max(0, len(self.received_messages) - 3), None)
+            for msg in recent:  # Show last 3
+                self._out(f"   📨 From {msg['sender_prefix']}...: {msg['message'][:50]}...")
 
     async def _phase_3_basic_emergency(self):
         """Phase 3: Demonstrate basic emergency communication."""
-        print(f"\n📋 PHASE 3: Basic Emergency Communication ({self.device_name})")
-        print("-" * 50)
-
-        emergency_scenarios = [
-            ("🚗 Car accident on highway - need immediate assistance!", "CRITICAL"),
-            ("🥾 Lost hiker in mountain trail - send help", "HIGH"),
-            ("🏥 Medical emergency - person unconscious", "CRITICAL"),
-            ("🔧 Vehicle breakdown in remote area", "MEDIUM"),
-            ("👀 Witnessing suspicious activity", "LOW")
-        ]
+        self._write_phase_header(3, "Basic Emergency Communication")
 
-        scenario = emergency_scenarios[self.device_id % len(emergency_scenarios)]
-        message, urgency = scenario
+        message, urgency = _EMERGENCY_SCENARIOS[self.device_id % len(_EMERGENCY_SCENARIOS)]
 
-        print(f"🚨 Emergency Scenario: {urgency}")
-        print(f"   Message: {message}")
+        self._out(
+            f"🚨 Emergency Scenario: {urgency}",
+            f"   Message: {message}"
+        )
 
         # Send emergency SOS
         packet_id = await self.client.send_sos(
@@ -236,17 +343,19 @@ class SonicWaveShowcase:
         )
 
         if packet_id:
-            print(f"✅ Emergency transmitted successfully!")
-            print(f"   📦 Packet ID: {packet_id}")
-            print(f"   ⚠️ Urgency: {urgency}")
-            print(f"   📡 Broadcasting via all available transports...")
+            self._out(
+                f"✅ Emergency transmitted successfully!",
+                f"   📦 Packet ID: {packet_id}",
+                f"   ⚠️ Urgency: {urgency}",
+                f"   📡 Broadcasting via all available transports..."
+            )
 
-            self.sent_messages.append({
-                'type': 'EMERGENCY',
+            self._record_sent({
+                'type': MsgType.EMERGENCY,
                 'message': message,
                 'urgency': urgency,
                 'packet_id': packet_id,
-                'time': datetime.now()
+                'time': time.monotonic()
             })
 
             # Wait for transmission and check for responses
@@ -254,16 +363,15 @@ class SonicWaveShowcase:
 
             # Check transmission status
             stats = self.client.get_stats()
-            print(f"   📊 Messages sent: {stats['client']['messages_sent']}")
+            self._out(f"   📊 Messages sent: {stats['client']['messages_sent']}")
 
             # Check for peer responses
-            recent_messages = [msg for msg in self.received_messages
-                             if (datetime.now() - msg['time']).seconds < 10]
-            if recent_messages:
-                print(f"   📨 Received {len(recent_messages)} recent responses!")
+            recent_count = self._count_recent(self._recent_received, 10, time.monotonic())
+            if recent_count:
+                self._out(f"   📨 Received {recent_count} recent responses!")
 
             # Check server reception
-            await self._check_server_reception(packet_id)
+            self._queue_confirmation(packet_id)
         else:
             print(f"❌ Emergency transmission failed!")
 
@@ -271,23 +379,15 @@ class SonicWaveShowcase:
 
     async def _phase_4_location_emergencies(self):
         """Phase 4: Demonstrate location-based emergency scenarios."""
-        print(f"\n📋 PHASE 4: Location-Based Emergencies ({self.device_name})")
-        print("-" * 50)
-
-        location_scenarios = [
-            # Format: (message, location_type, location_data)
-            ("🏢 Emergency at specific coordinates", "coordinates", (40.7589, -73.9851)),
-            ("🌳 Help needed at landmark", "text", "Central Park, near Bethesda Fountain"),
-            ("🚦 Accident at intersection", "text", "5th Avenue and 42nd Street"),
-            ("📍 Emergency at GPS location", "gps", None)  # Will use current/mock GPS
-        ]
+        self._write_phase_header(4, "Location-Based Emergencies")
 
-        scenario = location_scenarios[self.device_id % len(location_scenarios)]
-        message, location_type, location_data = scenario
+        message, location_type, location_data = _LOCATION_SCENARIOS[self.device_id % len(_LOCATION_SCENARIOS)]
 
-        print(f"📍 Location Emergency Scenario:")
-        print(f"   Type: {location_type.upper()}")
-        print(f"   Message: {message}")
+        self._out(
+            f"📍 Location Emergency Scenario:",
+            f"   Type: {location_type.upper()}",
+            f"   Message: {message}"
+        )
 
         if location_type == "coordinates":
             lat, lon = location_data
@@ -297,7 +397,7 @@ class SonicWaveShowcase:
                 longitude=lon,
                 urgency="HIGH"
             )
-            print(f"   📍 Coordinates: {lat:.6f}, {lon:.6f}")
+            self._out(f"   📍 Coordinates: {lat:.6f}, {lon:.6f}")
 
         elif location_type == "text":
             packet_id = await self.client.send_sos(
@@ -305,24 +405,24 @@ class SonicWaveShowcase:
                 location=location_data,
                 urgency="HIGH"
             )
-            print(f"   📍 Location: {location_data}")
+            self._out(f"   📍 Location: {location_data}")
 
         elif location_type == "gps":
             packet_id = await self.client.send_sos(
                 message=message,
                 urgency="HIGH"
             )
-            print(f"   📍 Using GPS/Mock location")
+            self._out(f"   📍 Using GPS/Mock location")
 
         if packet_id:
-            print(f"✅ Location-based emergency sent: {packet_id}")
-            self.sent_messages.append({
-                'type': 'LOCATION_EMERGENCY',
+            self._out(f"✅ Location-based emergency sent: {packet_id}")
+            self._record_sent({
+                'type': MsgType.LOCATION_EMERGENCY,
                 'message': message,
                 'packet_id': packet_id,
-                'time': datetime.now()
+                'time': time.monotonic()
             })
-            await self._check_server_reception(packet_id)
+            self._queue_confirmation(packet_id)
         else:
             print(f"❌ Location emergency failed!")
 
@@ -330,15 +430,16 @@ class SonicWaveShowcase:
 
     async def _phase_5_multi_device(self):
         """Phase 5: Demonstrate multi-device mesh communication."""
-        print(f"\n📋 PHASE 5: Multi-Device Mesh Communication ({self.device_name})")
-        print("-" * 50)
+        self._write_phase_header(5, "Multi-Device Mesh Communication")
 
         # Send a mesh networking test message
         mesh_message = f"🌐 Mesh network test from {self.device_name} - relay this message!"
 
-        print(f"🌐 Mesh Network Test:")
-        print(f"   Sending: {mesh_message}")
-        print(f"   This message should be relayed by other devices in range")
+        self._out(
+            f"🌐 Mesh Network Test:",
+            f"   Sending: {mesh_message}",
+            f"   This message should be relayed by other devices in range"
+        )
 
         packet_id = await self.client.send_sos(
             message=mesh_message,
@@ -346,98 +447,106 @@ class SonicWaveShowcase:
         )
 
         if packet_id:
-            print(f"✅ Mesh message transmitted: {packet_id}")
-            self.sent_messages.append({
-                'type': 'MESH_TEST',
+            self._out(f"✅ Mesh message transmitted: {packet_id}")
+            self._record_sent({
+                'type': MsgType.MESH_TEST,
                 'message': mesh_message,
                 'packet_id': packet_id,
-                'time': datetime.now()
+                'time': time.monotonic()
             })
 
             # Wait for potential relay activity
-            print(f"⏳ Monitoring for relay activity...")
+            self._out(f"⏳ Monitoring for relay activity...")
             await asyncio.sleep(8)
 
             # Check for received messages
             stats = self.client.get_stats()
-            print(f"📊 Network Activity:")
-            print(f"   Messages sent: {stats['client']['messages_sent']}")
-            print(f"   Messages received: {stats['client']['messages_received']}")
-            print(f"   Queue size: {stats['queue_size']}")
+            self._out(
+                f"📊 Network Activity:",
+                f"   Messages sent: {stats['client']['messages_sent']}",
+                f"   Messages received: {stats['client']['messages_received']}",
+                f"   Queue size: {stats['queue_size']}"
+            )
 
             # Show current peers
-            print(f"   👥 Current peers: {len(self.discovered_peers)}")
+            self._out(f"   👥 Current peers: {len(self.discovered_peers)}")
             if self.discovered_peers:
                 for peer_id, peer_info in list(self.discovered_peers.items())[:3]:
-                    print(f"      └─ {peer_id[:8]}...: {peer_info['message_count']} messages")
+                    self._out(f"      └─ {peer_info.prefix}...: {peer_info.message_count} messages")
 
         await asyncio.sleep(2)
 
     async def _phase_6_realtime_communication(self):
         """Phase 6: Real-time communication demonstration."""
-        print(f"\n📋 PHASE 6: Real-Time Communication Loop ({self.device_name})")
-        print("-" * 50)
+        self._write_phase_header(6, "Real-Time Communication Loop")
 
-        print(f"🔄 Starting real-time communication test...")
-        print(f"💡 This will send periodic messages and show responses")
-        print(f"🎯 Perfect for testing with multiple devices!")
+        self._out(
+            f"🔄 Starting real-time communication test...",
+            f"💡 This will send periodic messages and show responses",
+            f"🎯 Perfect for testing with multiple devices!"
+        )
+
+        # Send status updates and sample activity concurrently, offset by half an interval
+        await asyncio.gather(self._phase_6_producer(), self._phase_6_sampler())
 
-        # Send status updates and monitor responses
-        for round_num in range(1, 6):  # 5 rounds
-            print(f"\n🔄 Round {round_num}/5:")
+        self._out(
+            f"\n✅ Real-time communication test completed!",
+            f"📊 Final stats: Sent {self._sent_total}, Received {self._received_total}"
+        )
 
-            # Send status message
-            status_msg = f"Status update #{round_num} from {self.device_name} at {datetime.now().strftime('%H:%M:%S')}"
+    async def _phase_6_producer(self):
+        """Send one status update per round."""
+        for round_num in range(1, PHASE_6_ROUNDS + 1):
+            status_msg = f"Status update #{round_num} from {self.device_name} at {time.strftime('%H:%M:%S')}"
             packet_id = await self.client.send_sos(
                 message=status_msg,
                 urgency="LOW"
             )
 
+            self._out(f"\n🔄 Round {round_num}/{PHASE_6_ROUNDS}:")
             if packet_id:
-                print(f"   📤 Sent: {status_msg}")
-                self.sent_messages.append({
-                    'type': 'STATUS_UPDATE',
+                self._out(f"   📤 Sent: {status_msg}")
+                self._record_sent({
+                    'type': MsgType.STATUS_UPDATE,
                     'message': status_msg,
                     'packet_id': packet_id,
-                    'time': datetime.now()
+                    'time': time.monotonic()
                 })
+            else:
+                print(f"   ❌ Status update failed")
 
-                # Wait and check for responses
-                await asyncio.sleep(4)
-
-                # Show recent activity
-                recent_received = [msg for msg in self.received_messages
-                                 if (datetime.now() - msg['time']).seconds < 8]
-                recent_sent = [msg for msg in self.sent_messages
-                             if (datetime.now() - msg['time']).seconds < 8]
+            await asyncio.sleep(PHASE_6_INTERVAL)
 
-                print(f"   📊 Activity: Sent {len(recent_sent)}, Received {len(recent_received)}")
+    async def _phase_6_sampler(self):
+        """Report recent activity once per round, midway between sends."""
+        await asyncio.sleep(PHASE_6_INTERVAL / 2)
+        for _ in range(PHASE_6_ROUNDS):
+            now = time.monotonic()
+            recent_received = self._count_recent(self._recent_received, 8, now)
+            recent_sent = self._count_recent(self._recent_sent, 8, now)
 
-                # Show any new messages
-                if recent_received:
-                    latest = recent_received[-1]
-                    print(f"   📨 Latest: From {latest['sender_id'][:8]}...: {latest['message'][:40]}...")
+            lines = [f"   📊 Activity: Sent {recent_sent}, Received {recent_received}"]
 
-                # Show peer count
-                active_peers = len([p for p in self.discovered_peers.values()
-                                  if (datetime.now() - p['last_seen']).seconds < 30])
-                print(f"   👥 Active peers: {active_peers}")
+            # Show any new messages
+            if recent_received:
+                latest = self.received_messages[-1]
+                lines.append(f"   📨 Latest: From {latest['sender_prefix']}...: {latest['message'][:40]}...")
 
-            await asyncio.sleep(3)
+            # Show peer count
+            lines.append(f"   👥 Active peers: {self._active_peer_count(now)}")
+            self._out(*lines)
 
-        print(f"\n✅ Real-time communication test completed!")
-        print(f"📊 Final stats: Sent {len(self.sent_messages)}, Received {len(self.received_messages)}")
+            await asyncio.sleep(PHASE_6_INTERVAL)
 
     async def _phase_7_server_integration(self):
         """Phase 7: Server integration demonstration."""
-        print(f"\n📋 PHASE 7: Server Integration Demo ({self.device_name})")
-        print("-" * 50)
+        self._write_phase_header(7, "Server Integration Demo")
 
         # Test server connectivity
         server_available = await self._test_server_connection()
 
         if server_available:
-            print(f"✅ Server is available - testing integration")
+            self._out(f"✅ Server is available - testing integration")
 
             # Send a server test message
             server_msg = f"Server integration test from {self.device_name}"
@@ -447,80 +556,106 @@ class SonicWaveShowcase:
             )
 
             if packet_id:
-                print(f"📤 Sent server test message: {packet_id}")
+                self._out(f"📤 Sent server test message: {packet_id}")
                 await asyncio.sleep(3)
-                await self._check_server_reception(packet_id)
+                self._queue_confirmation(packet_id)
         else:
-            print(f"⚠️ Server not available - skipping integration test")
-            print(f"💡 Start server with: python server.py")
+            self._out(
+                f"⚠️ Server not available - skipping integration test",
+                f"💡 Start server with: python server.py"
+            )
+
+        # Let outstanding receipt checks finish, then report them together
+        try:
+            await asyncio.wait_for(self._confirm_q.join(), timeout=CONFIRM_DELAY + 8)
+        except asyncio.TimeoutError:
+            pass
+        total = self._confirmed + self._unconfirmed
+        if total:
+            self._out(f"📬 Server confirmed {self._confirmed}/{total} packets")
 
     async def _showcase_summary(self):
-        """Final summary of the showcase."""
-        print(f"\n🎯 SHOWCASE SUMMARY ({self.device_name})")
-        print("=" * 50)
+        """Final summary of the showcase, printed as one block even with --quiet."""
+        lines = []
+        lines.append(f"\n🎯 SHOWCASE SUMMARY ({self.device_name})")
+        lines.append("=" * 50)
 
-        print(f"📊 Communication Statistics:")
-        print(f"   📤 Messages Sent: {len(self.sent_messages)}")
-        print(f"   📥 Messages Received: {len(self.received_messages)}")
-        print(f"   👥 Peers Discovered: {len(self.discovered_peers)}")
+        lines.append(f"📊 Communication Statistics:")
+        lines.append(f"   📤 Messages Sent: {self._sent_total}")
+        lines.append(f"   📥 Messages Received: {self._received_total}")
+        lines.append(f"   👥 Peers Discovered: {len(self.discovered_peers)}")
 
         if self.discovered_peers:
-            print(f"\n👥 Discovered Peers:")
+            lines.append(f"\n👥 Discovered Peers:")
             for peer_id, peer_info in self.discovered_peers.items():
-                last_seen = (datetime.now() - peer_info['last_seen']).seconds
-                print(f"   🟢 {peer_id[:8]}... - {peer_info['message_count']} messages, last seen {last_seen}s ago")
+                last_seen = int(time.monotonic() - peer_info.last_seen)
+                lines.append(f"   🟢 {peer_info.prefix}... - {peer_info.message_count} messages, last seen {last_seen}s ago")
 
         # Message breakdown
-        message_types = {}
-        for msg in self.sent_messages:
-            msg_type = msg.get('type', 'UNKNOWN')
-            message_types[msg_type] = message_types.get(msg_type, 0) + 1
-
-        if message_types:
-            print(f"\n📋 Message Types Sent:")
-            for msg_type, count in message_types.items():
-                print(f"   {msg_type}: {count}")
+        if self._sent_counts:
+            lines.append(f"\n📋 Message Types Sent:")
+            for msg_type, count in self._sent_counts.items():
+                lines.append(f"   {msg_type.name}: {count}")
 
         # Success indicators
-        print(f"\n✅ Showcase Results:")
+        lines.append(f"\n✅ Showcase Results:")
         if len(self.discovered_peers) > 0:
-            print(f"   🎉 SUCCESS: Device discovery working!")
-            print(f"   🎉 SUCCESS: Peer-to-peer communication established!")
+            lines.append(f"   🎉 SUCCESS: Device discovery working!")
+            lines.append(f"   🎉 SUCCESS: Peer-to-peer communication established!")
         else:
-            print(f"   ⚠️  No peers discovered - try running multiple instances")
+            lines.append(f"   ⚠️  No peers discovered - try running multiple instances")
 
-        if len(self.received_messages) > 0:
-            print(f"   🎉 SUCCESS: Message receiving working!")
+        if self._received_total > 0:
+            lines.append(f"   🎉 SUCCESS: Message receiving working!")
 
-        if len(self.sent_messages) > 0:
-            print(f"   🎉 SUCCESS: Message sending working!")
+        if self._sent_total > 0:
+            lines.append(f"   🎉 SUCCESS: Message sending working!")
 
-        print(f"\n🚀 Showcase completed successfully!")
-        print(f"💡 Keep this running to continue communication with other devices")
+        lines.append(f"\n🚀 Showcase completed successfully!")
+        lines.append(f"💡 Keep this running to continue communication with other devices")
+
+        print("\n".join(lines))
 
     async def _monitor_messages(self):
         """Background task to monitor incoming messages."""
         while self.running:
             try:
-                # Check for new messages in the queue
-                if not self.client.message_queue.empty():
-                    try:
-                        # Process messages from queue
-                        while not self.client.message_queue.empty():
-                            packet = await asyncio.wait_for(
-                                self.client.message_queue.get(),
-                                timeout=0.1
-                            )
-                            await self._handle_received_packet(packet)
-                    except asyncio.TimeoutError:
-                        pass
-
-                await asyncio.sleep(0.5)  # Check every 500ms
+                # Sleep until a packet arrives; _cleanup cancels this task on shutdown
+                packet = await self.client.message_queue.get()
+                await self._handle_received_packet(packet)
 
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.error(f"Error in message monitor: {e}")
                 await asyncio.sleep(1)
 
+    def _record_sent(self, entry: dict):
+        """Remember a sent message and its timestamp for the activity window."""
+        self.sent_messages.append(entry)
+        self._sent_total += 1
+        self._recent_sent.append(entry['time'])
+        self._sent_counts[entry['type']] += 1
+
+    @staticmethod
+    def _count_recent(timestamps: deque, window: float, now: float) -> int:
+        """Count timestamps younger than window seconds, evicting ones older than RECENT_WINDOW."""
+        while timestamps and now - timestamps[0] >= RECENT_WINDOW:
+            timestamps.popleft()
+        count = 0
+        for ts in reversed(timestamps):
+            if now - ts >= window:
+                break
+            count += 1
+        return count
+
+    def _active_peer_count(self, now: float) -> int:
+        """Number of distinct peers heard from within PEER_ACTIVE_WINDOW."""
+        activity = self._peer_activity
+        while activity and now - activity[0][0] >= PEER_ACTIVE_WINDOW:
+            activity.popleft()
+        return len({sender_id for _, sender_id in activity})
+
     async def _handle_received_packet(self, packet: SOSPacket):
         """Handle a received packet."""
         try:
@@ -528,66 +663,143 @@ class SonicWaveShowcase:
             if packet.sender_id == self.client.node_id:
                 return
 
+            now = time.monotonic()
+
+            # Update peer tracking; the ID prefix is sliced once per peer
+            peer = self.discovered_peers.get(packet.sender_id)
+            if peer is None:
+                peer = self.discovered_peers[packet.sender_id] = PeerInfo(
+                    now, now, 1, packet.sender_id[:8]
+                )
+                self._out(f"\n🎉 NEW PEER DISCOVERED: {peer.prefix}...")
+            else:
+                peer.last_seen = now
+                peer.message_count += 1
+
             # Add to received messages
+            self._received_total += 1
             self.received_messages.append({
                 'sender_id': packet.sender_id,
+                'sender_prefix': peer.prefix,
                 'message': packet.message,
                 'urgency': packet.urgency,
                 'packet_id': packet.packet_id,
-                'time': datetime.now()
+                'time': now
             })
-
-            # Update peer tracking
-            if packet.sender_id not in self.discovered_peers:
-                self.discovered_peers[packet.sender_id] = {
-                    'first_seen': datetime.now(),
-                    'last_seen': datetime.now(),
-                    'message_count': 1
-                }
-                print(f"\n🎉 NEW PEER DISCOVERED: {packet.sender_id[:8]}...")
-            else:
-                self.discovered_peers[packet.sender_id]['last_seen'] = datetime.now()
-                self.discovered_peers[packet.sender_id]['message_count'] += 1
+            self._recent_received.append(now)
+            self._peer_activity.append((now, packet.sender_id))
 
         except Exception as e:
             logger.error(f"Error handling received packet: {e}")
 
+    def _session(self):
+        """Shared aiohttp session, created on first use."""
+        if self._http is None:
+            self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        return self._http
+
+    async def _http_status(self, path: str) -> int:
+        """GET a server path without blocking the event loop and return the HTTP status."""
+        url = f"{self.server_url}{path}"
+        if AIOHTTP_AVAILABLE:
+            async with self._session().get(url) as response:
+                return response.status
+
+        return await asyncio.get_running_loop().run_in_executor(None, self._urllib_status, url)
+
+    async def _http_json(self, path: str):
+        """GET a server path without blocking the event loop and decode the JSON body."""
+        url = f"{self.server_url}{path}"
+        if AIOHTTP_AVAILABLE:
+            async with self._session().get(url) as response:
+                response.raise_for_status()
+                return await response.json()
+
+        body = await asyncio.get_running_loop().run_in_executor(None, self._urllib_read, url)
+        return json.loads(body)
+
+    @staticmethod
+    def _urllib_read(url: str) -> bytes:
+        """Blocking stdlib GET returning the body; raises on HTTP errors. Run it in a thread."""
+        import urllib.request
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.read()
+
+    @staticmethod
+    def _urllib_status(url: str) -> int:
+        """Blocking stdlib GET used when aiohttp is not installed; run it in a thread."""
+        import urllib.request
+        import urllib.error
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
     async def _test_server_connection(self):
         """Test connection to the server."""
         try:
-            response = requests.get(f"{self.server_url}/status", timeout=5)
-            if response.status_code == 200:
-                print(f"✅ Server connection: OK")
+            if await self._http_status("/status") == 200:
+                self._out(f"✅ Server connection: OK")
                 return True
-        except:
+        except Exception:
             pass
 
-        print(f"⚠️ Server connection: Not available")
+        self._out(f"⚠️ Server connection: Not available")
         return False
 
-    async def _check_server_reception(self, packet_id: str):
-        """Check if server received the packet."""
-        try:
-            await asyncio.sleep(2)  # Wait for server processing
-            response = requests.get(f"{self.server_url}/packets/{packet_id}", timeout=5)
-            if response.status_code == 200:
-                print(f"   ✅ Server confirmed receipt: {packet_id}")
-                return True
-        except:
-            pass
+    def _queue_confirmation(self, packet_id: str):
+        """Ask the background confirmer to check that the server received a packet."""
+        self._confirm_q.put_nowait(packet_id)
 
-        print(f"   ⚠️ Server reception not confirmed")
-        return False
+    async def _confirmer(self):
+        """Check server receipt of queued packet IDs in batches, one request per batch."""
+        while True:
+            batch = [await self._confirm_q.get()]
+            while len(batch) < CONFIRM_BATCH_SIZE and not self._confirm_q.empty():
+                batch.append(self._confirm_q.get_nowait())
+
+            try:
+                await asyncio.sleep(CONFIRM_DELAY)  # Give the uploader time to forward them
+                try:
+                    packets = await self._http_json(f"/api/packets?limit={CONFIRM_LOOKUP_LIMIT}&hours=1")
+                    on_server = {p.get('packet_id') for p in packets}
+                except Exception:
+                    on_server = set()
+
+                for packet_id in batch:
+                    if packet_id in on_server:
+                        self._confirmed += 1
+                        self._out(f"   ✅ Server confirmed receipt: {packet_id}")
+                    else:
+                        self._unconfirmed += 1
+            finally:
+                for _ in batch:
+                    self._confirm_q.task_done()
 
     async def _cleanup(self):
         """Clean up resources."""
+        for task in (self._monitor_task, self._confirmer_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._monitor_task = None
+        self._confirmer_task = None
+
         if self.client:
             try:
                 await self.client.stop()
-                print(f"\n✅ Client stopped successfully")
+                self._out(f"\n✅ Client stopped successfully")
             except Exception as e:
                 print(f"❌ Error stopping client: {e}")
 
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
 async def main():
     """Main entry point with enhanced argument parsing."""
     parser = argparse.ArgumentParser(description='SonicWave Client Showcase')
@@ -596,6 +808,8 @@ async def main():
                        default=None)
     parser.add_argument('--auto', '-a', action='store_true',
                        help='Run in automatic mode (no user interaction)')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                       help='Send status lines to the debug log instead of stdout')
 
     args = parser.parse_args()
 
@@ -608,10 +822,12 @@ async def main():
     print(f"   python client_showcase.py --device {args.device + 1}")
     print()
 
-    showcase = SonicWaveShowcase(device_id=args.device)
+    showcase = SonicWaveShowcase(device_id=args.device, verbose=not args.quiet)
     await showcase.run_showcase()
 
 if __name__ == "__main__":
+    if UVLOOP_AVAILABLE:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
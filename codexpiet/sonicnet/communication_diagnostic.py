@@ -9,31 +9,61 @@ import logging
 import sys
 import time
 import json
+from collections import deque
 from datetime import datetime
+from itertools import chain, islice
+from operator import attrgetter
+from typing import NamedTuple
 
 # Add current directory to path
 import os
 sys.path.insert(0, os.getcwd())
 
 from client import SonicWaveClient
-from packet import SOSPacket
+from packet import SOSPacket, UrgencyLevel
 
-# Setup detailed logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Multi-line status blocks are emitted with one write rather than a print per line
+_OUT = sys.stdout.write
+
+# Packet records kept for display; totals are counted separately
+PACKET_HISTORY_SIZE = 2048
+# Seconds between live-monitoring status updates
+STATUS_INTERVAL = 5
+# Longest phase 4 waits for a packet from another device
+RECEIVE_WAIT = 10
+
+class PacketRecord(NamedTuple):
+    """A received packet as tracked by the diagnostic."""
+    sender_id: str
+    message: str
+    urgency: UrgencyLevel
+    packet_id: str
+    time: float  # time.monotonic() at receipt
+
 class CommunicationDiagnostic:
     """Comprehensive diagnostic tool for SonicWave communication issues."""
 
-    def __init__(self, device_name="DiagnosticDevice"):
+    def __init__(self, device_name="DiagnosticDevice", verbose=False):
         self.device_name = device_name
+        # Transport stats are printed compactly unless verbose output was requested
+        self._dump_opts = {'indent': 2} if verbose else {'separators': (',', ':')}
         self.client = None
-        self.running = False
-        self.received_packets = []
-        self.sent_packets = []
+        self._stop = asyncio.Event()  # Set by _cleanup; wakes any loop waiting on it
+        self._received_event = asyncio.Event()  # Set when a packet from another device arrives
+        self._monitor_task = None
+        # Received packets, split at arrival into our own echoes and other devices' packets
+        self.own_packets = deque(maxlen=PACKET_HISTORY_SIZE)
+        self.external_packets = deque(maxlen=PACKET_HISTORY_SIZE)
+        self.sent_packets = deque(maxlen=PACKET_HISTORY_SIZE)
+        self._received_total = 0
+        self._external_total = 0
+        self._sent_total = 0
+        # Wall/monotonic reference pair; packet times are monotonic and turned
+        # into clock strings only when printed
+        self._t0_wall = time.time()
+        self._t0_mono = time.monotonic()
 
     async def run_diagnostics(self):
         """Run comprehensive communication diagnostics."""
@@ -76,12 +106,11 @@ class CommunicationDiagnostic:
         print(f"✅ Client created: {self.client.node_id}")
 
         # Start background message monitoring
-        asyncio.create_task(self._monitor_messages())
+        self._monitor_task = asyncio.create_task(self._monitor_messages())
 
         await self.client.start()
         print(f"✅ Client started successfully")
 
-        self.running = True
         await asyncio.sleep(2)
 
     async def _phase_2_transport_testing(self):
@@ -89,34 +118,47 @@ class CommunicationDiagnostic:
         print(f"\n📋 PHASE 2: Transport Testing")
         print("-" * 40)
 
-        # Test each transport individually
-        for transport in self.client.transports:
+        async def _probe(transport):
+            """Test one transport, returning its report lines."""
             transport_name = type(transport).__name__
-            print(f"\n🔧 Testing {transport_name}:")
+            lines = [f"\n🔧 Testing {transport_name}:"]
 
             try:
                 # Check if transport is running
                 if hasattr(transport, 'running'):
-                    print(f"   Running: {'✅ Yes' if transport.running else '❌ No'}")
+                    lines.append(f"   Running: {'✅ Yes' if transport.running else '❌ No'}")
 
                 # Get transport stats
                 if hasattr(transport, 'get_transport_stats'):
                     stats = transport.get_transport_stats()
-                    print(f"   Stats: {json.dumps(stats, indent=6)}")
+                    lines.append(f"   Stats: {json.dumps(stats, **self._dump_opts)}")
 
-                # Test sending capability
+                # Test sending capability, with a packet of its own per transport
                 test_packet = SOSPacket(
                     sender_id=self.client.node_id,
                     message=f"Transport test from {transport_name}",
                     urgency="LOW"
                 )
 
-                print(f"   🚀 Attempting to send test packet...")
+                lines.append(f"   🚀 Attempting to send test packet...")
                 await transport.send(test_packet)
-                print(f"   ✅ Send successful")
+                lines.append(f"   ✅ Send successful")
 
             except Exception as e:
-                print(f"   ❌ Error: {e}")
+                lines.append(f"   ❌ Error: {e}")
+
+            return lines
+
+        # Probe every transport at once; slow ones (audio, BLE) no longer hold up the rest
+        results = await asyncio.gather(
+            *(_probe(transport) for transport in self.client.transports),
+            return_exceptions=True
+        )
+
+        for transport, lines in zip(self.client.transports, results):
+            if isinstance(lines, BaseException):
+                lines = [f"\n🔧 Testing {type(transport).__name__}:", f"   ❌ Error: {lines}"]
+            print("\n".join(lines))
 
     async def _phase_3_sending_test(self):
         """Phase 3: Test sending packets through the client."""
@@ -130,14 +172,21 @@ class CommunicationDiagnostic:
             "Diagnostic ping #3 - Testing reliability"
         ]
 
-        for i, message in enumerate(test_messages, 1):
+        # Dispatch all sends at once so the transports overlap them
+        packet_ids = await asyncio.gather(
+            *(self.client.send_sos(message=message, urgency="LOW") for message in test_messages),
+            return_exceptions=True
+        )
+
+        for i, (message, packet_id) in enumerate(zip(test_messages, packet_ids), 1):
             print(f"\n📤 Sending test message {i}:")
             print(f"   Message: {message}")
 
-            packet_id = await self.client.send_sos(message=message, urgency="LOW")
-
-            if packet_id:
+            if isinstance(packet_id, Exception):
+                print(f"   ❌ Send failed: {packet_id}")
+            elif packet_id:
                 print(f"   ✅ Sent successfully: {packet_id[:8]}...")
+                self._sent_total += 1
                 self.sent_packets.append({
                     'packet_id': packet_id,
                     'message': message,
@@ -146,7 +195,7 @@ class CommunicationDiagnostic:
             else:
                 print(f"   ❌ Send failed")
 
-            await asyncio.sleep(2)
+        await asyncio.sleep(2)  # Let the transports settle
 
         # Show sending stats
         stats = self.client.get_stats()
@@ -170,26 +219,34 @@ class CommunicationDiagnostic:
         print(f"   Client running status: {'✅ Running' if self.client.running else '❌ Stopped'}")
 
         # Check for any messages received so far
-        print(f"   Messages received so far: {len(self.received_packets)}")
+        print(f"   Messages received so far: {self._received_total}")
 
-        if self.received_packets:
+        recent = sorted(
+            chain(islice(reversed(self.own_packets), 3), islice(reversed(self.external_packets), 3)),
+            key=attrgetter('time')
+        )[-3:]
+        if recent:
             print(f"   📨 Recent received messages:")
-            for msg in self.received_packets[-3:]:
-                print(f"      - From {msg['sender_id'][:8]}...: {msg['message'][:50]}...")
+            for msg in recent:
+                print(f"      - From {msg.sender_id[:8]}...: {msg.message[:50]}...")
 
-        # Wait and monitor for incoming messages
-        print(f"\n⏳ Monitoring for incoming messages for 10 seconds...")
-        for i in range(10):
-            await asyncio.sleep(1)
-            new_count = len(self.received_packets)
-            queue_size = self.client.message_queue.qsize()
-            print(f"   [{i+1:2d}s] Received: {new_count}, Queue: {queue_size}")
+        # Wait until another device is heard from, with one status sample halfway through
+        print(f"\n⏳ Monitoring for incoming messages for up to {RECEIVE_WAIT} seconds...")
+        half = RECEIVE_WAIT / 2
+        for elapsed in (half, RECEIVE_WAIT):
+            try:
+                await asyncio.wait_for(self._received_event.wait(), timeout=half)
+                print(f"   📨 External message received, ending wait early")
+                break
+            except asyncio.TimeoutError:
+                queue_size = self.client.message_queue.qsize()
+                print(f"   [{elapsed:4.1f}s] Received: {self._received_total}, Queue: {queue_size}")
 
         # Final receiving stats
         stats = self.client.get_stats()
         print(f"\n📊 Receiving Statistics:")
         print(f"   Messages received by client: {stats['client']['messages_received']}")
-        print(f"   Our messages captured: {len(self.received_packets)}")
+        print(f"   Our messages captured: {self._received_total}")
 
     async def _phase_5_live_monitoring(self):
         """Phase 5: Live monitoring and interaction."""
@@ -200,37 +257,45 @@ class CommunicationDiagnostic:
         print(f"💡 Run another instance to test communication!")
         print(f"⚡ Press Ctrl+C to stop")
 
-        last_stats_time = 0
+        last_stats_time = float('-inf')
 
-        while self.running:
+        while not self._stop.is_set():
             try:
-                current_time = time.time()
+                current_time = time.monotonic()
 
-                # Show periodic status
-                if current_time - last_stats_time > 5:  # Every 5 seconds
+                # Show periodic status; stats are only gathered when they are printed
+                if current_time - last_stats_time > STATUS_INTERVAL:
                     last_stats_time = current_time
 
                     stats = self.client.get_stats()
+                    transports_active = stats['client']['transports_active']
+                    transport_items = stats['transports'].items()
                     queue_size = self.client.message_queue.qsize()
 
-                    print(f"\n⏰ [{datetime.now().strftime('%H:%M:%S')}] Status Update:")
-                    print(f"   📤 Sent: {len(self.sent_packets)} | 📥 Received: {len(self.received_packets)}")
-                    print(f"   📊 Queue: {queue_size} | 🔧 Transports: {stats['client']['transports_active']}")
+                    lines = [
+                        f"\n⏰ [{datetime.now().strftime('%H:%M:%S')}] Status Update:",
+                        f"   📤 Sent: {self._sent_total} | 📥 Received: {self._received_total}",
+                        f"   📊 Queue: {queue_size} | 🔧 Transports: {transports_active}",
+                    ]
 
                     # Show transport-specific stats
-                    for transport_name, transport_stats in stats['transports'].items():
+                    for transport_name, transport_stats in transport_items:
                         if isinstance(transport_stats, dict) and 'packets_sent' in transport_stats:
-                            sent = transport_stats.get('packets_sent', 0)
-                            received = transport_stats.get('packets_received', 0)
-                            running = transport_stats.get('running', False)
+                            get = transport_stats.get
+                            sent = get('packets_sent', 0)
+                            received = get('packets_received', 0)
+                            running = get('running', False)
                             status = '🟢' if running else '🔴'
-                            print(f"   {status} {transport_name}: S={sent}, R={received}")
+                            lines.append(f"   {status} {transport_name}: S={sent}, R={received}")
+
+                    _OUT("\n".join(lines) + "\n")
 
                 # Send periodic discovery pings
-                if len(self.sent_packets) % 3 == 0:  # Every few iterations
+                if self._sent_total % 3 == 0:  # Every few iterations
                     discovery_msg = f"Live discovery ping from {self.device_name} at {datetime.now().strftime('%H:%M:%S')}"
                     packet_id = await self.client.send_sos(message=discovery_msg, urgency="LOW")
                     if packet_id:
+                        self._sent_total += 1
                         self.sent_packets.append({
                             'packet_id': packet_id,
                             'message': discovery_msg,
@@ -238,7 +303,11 @@ class CommunicationDiagnostic:
                         })
                         print(f"   📡 Discovery ping sent: {packet_id[:8]}...")
 
-                await asyncio.sleep(2)
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=2)
+                    break
+                except asyncio.TimeoutError:
+                    pass
 
             except KeyboardInterrupt:
                 break
@@ -248,56 +317,77 @@ class CommunicationDiagnostic:
 
     async def _monitor_messages(self):
         """Background task to monitor incoming messages."""
-        while self.running:
-            try:
-                # Check for new messages in the queue
-                if not self.client.message_queue.empty():
-                    try:
-                        while not self.client.message_queue.empty():
-                            packet = await asyncio.wait_for(
-                                self.client.message_queue.get(),
-                                timeout=0.1
-                            )
-                            await self._handle_received_packet(packet)
-                    except asyncio.TimeoutError:
-                        pass
-
-                await asyncio.sleep(0.2)  # Check every 200ms
-
-            except Exception as e:
-                logger.error(f"Error in message monitor: {e}")
-                await asyncio.sleep(1)
+        queue = self.client.message_queue
+        self._t0_wall = time.time()
+        self._t0_mono = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                try:
+                    # Sleep until a packet arrives, then drain whatever else is waiting
+                    packet = await queue.get()
+                    await self._handle_received_packet(packet)
+                    while True:
+                        try:
+                            packet = queue.get_nowait()
+                        except asyncio.QueueEmpty:
+                            break
+                        await self._handle_received_packet(packet)
+
+                except Exception as e:
+                    logger.error("Error in message monitor: %s", e)
+                    await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            pass
 
     async def _handle_received_packet(self, packet: SOSPacket):
         """Handle a received packet."""
         try:
             # Track all packets (including our own for debugging)
-            self.received_packets.append({
-                'sender_id': packet.sender_id,
-                'message': packet.message,
-                'urgency': packet.urgency,
-                'packet_id': packet.packet_id,
-                'time': datetime.now(),
-                'is_own': packet.sender_id == self.client.node_id
-            })
+            mono = time.monotonic()
+            is_own = packet.sender_id == self.client.node_id
+            self._received_total += 1
+            if not is_own:
+                self._external_total += 1
+                self._received_event.set()
+            (self.own_packets if is_own else self.external_packets).append(PacketRecord(
+                packet.sender_id,
+                packet.message,
+                packet.urgency,
+                packet.packet_id,
+                mono
+            ))
 
             # Show real-time notification
-            time_str = datetime.now().strftime('%H:%M:%S')
+            time_str = self._clock_str(mono)
             sender_short = packet.sender_id[:8]
 
-            if packet.sender_id == self.client.node_id:
-                print(f"\n📨 [{time_str}] 🔄 OWN MESSAGE: {sender_short}...: {packet.message[:40]}...")
+            if is_own:
+                _OUT(f"\n📨 [{time_str}] 🔄 OWN MESSAGE: {sender_short}...: {packet.message[:40]}...\n")
             else:
-                print(f"\n📨 [{time_str}] 🎉 EXTERNAL MESSAGE: {sender_short}...: {packet.message[:40]}...")
-                print(f"   🎯 SUCCESS! Device discovery working!")
+                _OUT("\n".join((
+                    f"\n📨 [{time_str}] 🎉 EXTERNAL MESSAGE: {sender_short}...: {packet.message[:40]}...",
+                    f"   🎯 SUCCESS! Device discovery working!",
+                )) + "\n")
 
         except Exception as e:
-            logger.error(f"Error handling received packet: {e}")
+            logger.error("Error handling received packet: %s", e)
+
+    def _clock_str(self, mono: float) -> str:
+        """Format a monotonic timestamp as wall-clock HH:MM:SS."""
+        return time.strftime('%H:%M:%S', time.localtime(self._t0_wall + (mono - self._t0_mono)))
 
     async def _cleanup(self):
         """Clean up resources."""
         print(f"\n🧹 Cleaning up...")
-        self.running = False
+        self._stop.set()
+
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
 
         if self.client:
             try:
@@ -309,17 +399,17 @@ class CommunicationDiagnostic:
         # Final summary
         print(f"\n📊 FINAL DIAGNOSTIC SUMMARY")
         print("=" * 50)
-        print(f"📤 Total messages sent: {len(self.sent_packets)}")
-        print(f"📥 Total messages received: {len(self.received_packets)}")
+        print(f"📤 Total messages sent: {self._sent_total}")
+        print(f"📥 Total messages received: {self._received_total}")
 
-        external_messages = [msg for msg in self.received_packets if not msg['is_own']]
-        print(f"🎯 External messages received: {len(external_messages)}")
+        external_messages = self.external_packets
+        print(f"🎯 External messages received: {self._external_total}")
 
         if external_messages:
             print(f"🎉 SUCCESS: Device communication is working!")
             print(f"📋 External messages:")
-            for msg in external_messages[-3:]:
-                print(f"   - From {msg['sender_id'][:8]}...: {msg['message'][:50]}...")
+            for msg in reversed(list(islice(reversed(external_messages), 3))):
+                print(f"   - From {msg.sender_id[:8]}...: {msg.message[:50]}...")
         else:
             print(f"⚠️  No external messages received")
             print(f"💡 Possible issues:")
@@ -336,10 +426,18 @@ async def main():
     parser.add_argument('--device', '-d',
                        help='Device name for identification',
                        default=f"Diagnostic-{datetime.now().strftime('%H%M%S')}")
+    parser.add_argument('--verbose', '-v', action='store_true',
+                       help='Pretty-print transport stats and enable debug logging')
 
     args = parser.parse_args()
 
-    diagnostic = CommunicationDiagnostic(device_name=args.device)
+    # Detailed transport logging only when asked for
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    diagnostic = CommunicationDiagnostic(device_name=args.device, verbose=args.verbose)
     await diagnostic.run_diagnostics()
 
 if __name__ == "__main__":
@@ -45,12 +45,14 @@ async def comprehensive_transport_test():
         }
         transport_activity[packet.packet_id] = transport_info
 
-        print(f"\n📨 PACKET RECEIVED!")
-        print(f"   Type: {packet.packet_type.value}")
-        print(f"   From: {packet.sender_id}")
-        print(f"   Via: {packet.received_via}")
-        print(f"   Message: {transport_info['message']}")
-        print(f"   Time: {transport_info['timestamp']}")
+        sys.stdout.write("\n".join((
+            f"\n📨 PACKET RECEIVED!",
+            f"   Type: {packet.packet_type.value}",
+            f"   From: {packet.sender_id}",
+            f"   Via: {packet.received_via}",
+            f"   Message: {transport_info['message']}",
+            f"   Time: {transport_info['timestamp']}",
+        )) + "\n")
 
     client.register_event_callback('packet_received', on_packet_received)
 
@@ -66,21 +68,23 @@ async def comprehensive_transport_test():
 
         active_transports = []
         for transport_name, transport_stats in stats['transport_stats'].items():
-            status = "🟢 ACTIVE" if transport_stats.get('running', False) else "🔴 INACTIVE"
+            get = transport_stats.get
+            running = get('running', False)
+            status = "🟢 ACTIVE" if running else "🔴 INACTIVE"
             print(f"  {transport_name}: {status}")
 
-            if transport_stats.get('running', False):
+            if running:
                 active_transports.append(transport_name)
 
             # Show specific stats for each transport
             if transport_name == "UDPMeshTransport":
-                print(f"    Multicast: {transport_stats.get('multicast_group', 'N/A')}:{transport_stats.get('port', 'N/A')}")
+                print(f"    Multicast: {get('multicast_group', 'N/A')}:{get('port', 'N/A')}")
             elif transport_name == "GGWaveTransport":
-                print(f"    Audio Available: {transport_stats.get('audio_available', 'N/A')}")
-                print(f"    Volume: {transport_stats.get('volume', 'N/A')}")
+                print(f"    Audio Available: {get('audio_available', 'N/A')}")
+                print(f"    Volume: {get('volume', 'N/A')}")
             elif transport_name == "BLEMeshTransport":
-                print(f"    Peers Discovered: {transport_stats.get('discovered_peers', 0)}")
-                print(f"    Connected Peers: {transport_stats.get('connected_peers', 0)}")
+                print(f"    Peers Discovered: {get('discovered_peers', 0)}")
+                print(f"    Connected Peers: {get('connected_peers', 0)}")
 
         print(f"\n✅ Active Transports: {len(active_transports)}")
 
@@ -123,8 +127,9 @@ async def comprehensive_transport_test():
         final_stats = client.get_comprehensive_stats()
 
         for transport_name, transport_stats in final_stats['transport_stats'].items():
+            get = transport_stats.get
             print(f"\n  🚀 {transport_name}:")
-            print(f"    Status: {'🟢 ACTIVE' if transport_stats.get('running', False) else '🔴 INACTIVE'}")
+            print(f"    Status: {'🟢 ACTIVE' if get('running', False) else '🔴 INACTIVE'}")
 
             # Common stats
             if 'packets_sent' in transport_stats:
@@ -134,14 +139,14 @@ async def comprehensive_transport_test():
 
             # Transport-specific stats
             if transport_name == "UDPMeshTransport":
-                print(f"    Send Errors: {transport_stats.get('send_errors', 0)}")
-                print(f"    Receive Errors: {transport_stats.get('receive_errors', 0)}")
+                print(f"    Send Errors: {get('send_errors', 0)}")
+                print(f"    Receive Errors: {get('receive_errors', 0)}")
             elif transport_name == "GGWaveTransport":
-                print(f"    Messages Sent: {transport_stats.get('messages_sent', 0)}")
-                print(f"    Audio Errors: {transport_stats.get('audio_errors', 0)}")
+                print(f"    Messages Sent: {get('messages_sent', 0)}")
+                print(f"    Audio Errors: {get('audio_errors', 0)}")
             elif transport_name == "BLEMeshTransport":
-                print(f"    Connection Failures: {transport_stats.get('connection_failures', 0)}")
-                print(f"    Peers Discovered: {transport_stats.get('discovered_peers', 0)}")
+                print(f"    Connection Failures: {get('connection_failures', 0)}")
+                print(f"    Peers Discovered: {get('discovered_peers', 0)}")
 
         # Overall network stats
         print(f"\n📈 OVERALL NETWORK STATS:")
@@ -173,13 +178,14 @@ async def comprehensive_transport_test():
         failed_transports = []
 
         for transport_name, transport_stats in final_stats['transport_stats'].items():
-            if transport_stats.get('running', False):
+            get = transport_stats.get
+            if get('running', False):
                 # Check if transport actually sent packets
-                sent_packets = (transport_stats.get('packets_sent', 0) +
-                               transport_stats.get('messages_sent', 0))
-                errors = (transport_stats.get('send_errors', 0) +
-                         transport_stats.get('audio_errors', 0) +
-                         transport_stats.get('connection_failures', 0))
+                sent_packets = (get('packets_sent', 0) +
+                               get('messages_sent', 0))
+                errors = (get('send_errors', 0) +
+                         get('audio_errors', 0) +
+                         get('connection_failures', 0))
 
                 if sent_packets > 0 and errors == 0:
                     working_transports.append(transport_name)
@@ -7,6 +7,7 @@ import logging
 import uuid
 import time
 import psutil
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any
 
 from packet import SOSPacket, PacketType, UrgencyLevel, GPSLocation
@@ -36,6 +37,9 @@ class SonicWaveClient:
         self.transports = []
         self.running = False
 
+        # Packets held back while a batch_sends() block is open
+        self._batched_packets: Optional[List[SOSPacket]] = None
+
         # User profile and emergency info
         self.user_profile = {
             'name': '',
@@ -180,8 +184,44 @@ class SonicWaveClient:
         logger.info(f"All clear sent for thread {thread_id}")
         return packet
 
+    @asynccontextmanager
+    async def batch_sends(self):
+        """Defer broadcasts made inside the block and flush them together on exit."""
+        if self._batched_packets is not None:
+            # Nested block, the outermost one flushes
+            yield
+            return
+
+        self._batched_packets = []
+        try:
+            yield
+        finally:
+            packets, self._batched_packets = self._batched_packets, None
+            await self._flush_batch(packets)
+
+    async def _flush_batch(self, packets: List[SOSPacket]):
+        """Sends a batch of packets, in order, with one send task per transport."""
+        if not packets:
+            return
+
+        async def send_all(transport):
+            for packet in packets:
+                try:
+                    await transport.send(packet)
+                except Exception as e:
+                    logger.error(f"Batched send via {transport.__class__.__name__} failed: {e}")
+
+        if self.transports:
+            await asyncio.gather(*(send_all(transport) for transport in self.transports))
+
+        self.packet_manager.stats['packets_sent'] += len(packets)
+
     async def _broadcast(self, packet: SOSPacket):
         """Broadcasts a packet to all active transports with retry logic."""
+        if self._batched_packets is not None:
+            self._batched_packets.append(packet)
+            return
+
         broadcast_tasks = []
 
         for transport in self.transports:
@@ -361,6 +401,13 @@ class SonicWaveClient:
 
         return stats
 
+    def get_running_map(self) -> Dict[str, bool]:
+        """Get whether each transport is running, without collecting full stats."""
+        return {
+            transport.__class__.__name__: getattr(transport, 'running', False)
+            for transport in self.transports
+        }
+
     def get_active_conversations(self) -> List[Dict]:
         """Get all active emergency conversations."""
         conversations = []
@@ -101,6 +101,7 @@ class SOSPacket:
             self.gps_location = None
 
         self.packet_id = self._generate_packet_id()
+        self._set_short_ids()
         self.hop_count = 0
         self.relay_path = [sender_id]
         self.ttl = self._calculate_ttl()
@@ -126,6 +127,11 @@ class SOSPacket:
         }
         return ttl_map.get(self.urgency, 10)
 
+    def _set_short_ids(self):
+        """Cache the 8-character ID prefixes used in log lines."""
+        self.short_id = self.packet_id[:8]
+        self.sender_short = self.sender_id[:8]
+
     def _generate_packet_id(self) -> str:
         """Generates a unique ID for the packet based on its content and timestamp."""
         data = f"{self.sender_id}:{self.message}:{self.timestamp}:{self.thread_id}"
@@ -198,6 +204,7 @@ class SOSPacket:
 
         # Restore packet metadata
         packet.packet_id = data['packet_id']
+        packet._set_short_ids()
         packet.timestamp = data['timestamp']
         packet.hop_count = data.get('hop_count', 0)
         packet.relay_path = data.get('relay_path', [data['sender_id']])
@@ -14,6 +14,18 @@ from config import PACKET_CACHE_LIMIT, PACKET_EXPIRATION
 
 logger = logging.getLogger(__name__)
 
+class PacketValidationError(ValueError):
+    """Raised when a received object is not a usable SOS packet."""
+    pass
+
+def validate_packet(packet) -> SOSPacket:
+    """Check that a received object is an SOSPacket with IDs set. Returns it unchanged."""
+    if not isinstance(packet, SOSPacket):
+        raise PacketValidationError(f"Expected SOSPacket, got {type(packet).__name__}")
+    if not packet.packet_id or not packet.sender_id:
+        raise PacketValidationError("Packet is missing its packet_id or sender_id")
+    return packet
+
 class PacketPriorityQueue:
     """Priority queue for packet processing."""
     def __init__(self):
@@ -114,7 +126,36 @@ class PacketManager:
         """
         Adds a packet to the cache if it's new. Returns True if added, False otherwise.
         Enhanced with anti-flooding and intelligent routing.
+        Raises PacketValidationError if the packet is malformed.
+        """
+        validate_packet(packet)
+        added = self._insert_packet(packet, from_transport, signal_strength)
+
+        # Enforce cache limit
+        if added and len(self.packet_cache) > PACKET_CACHE_LIMIT:
+            self._prune_cache()
+
+        return added
+
+    def add_batch(self, packets: List[SOSPacket], from_transport: str = None) -> int:
+        """
+        Adds several packets in one pass, pruning the cache at most once.
+        Packets must already have passed validate_packet().
+        Returns the number of packets that were new.
         """
+        added = 0
+        for packet in packets:
+            if self._insert_packet(packet, from_transport):
+                added += 1
+
+        if added and len(self.packet_cache) > PACKET_CACHE_LIMIT:
+            self._prune_cache()
+
+        return added
+
+    def _insert_packet(self, packet: SOSPacket, from_transport: str = None,
+                       signal_strength: float = None) -> bool:
+        """Dedup, rate-limit and cache a single packet without pruning."""
         # Check for duplicates
         if packet.packet_id in self.seen_packet_ids:
             self.stats['duplicates_filtered'] += 1
@@ -157,10 +198,6 @@ class PacketManager:
         # Add to priority queue for processing
         self.priority_queue.put(packet)
 
-        # Enforce cache limit
-        if len(self.packet_cache) > PACKET_CACHE_LIMIT:
-            self._prune_cache()
-
         logger.info(f"Added packet {packet.packet_id} from {packet.sender_id} "
                    f"(type: {packet.packet_type.value}, urgency: {packet.urgency.value})")
         return True
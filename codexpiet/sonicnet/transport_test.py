@@ -161,9 +161,6 @@ class TransportTester:
                         # Unknown transport, log it anyway
                         logger.info(f"Received message from unknown transport: {packet.message}")
 
-                # Mark task as done
-                self.message_queue.task_done()
-
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -19,10 +19,14 @@ try:
     from bleak import BleakScanner, BleakClient
     from bleak.backends.device import BLEDevice as BleakBLEDevice
     from bleak.advertising import AdvertisementData, BleakScanner
+    from bleak.exc import BleakError
 
     BLE_AVAILABLE = True
 except ImportError:
     BLE_AVAILABLE = False
+
+    class BleakError(Exception):
+        pass
     # Create dummy classes when bleak is not available
     class BleakBLEDevice:
         pass
@@ -36,10 +40,28 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-# SonicWave BLE service and characteristic UUIDs
-SONICWAVE_SERVICE_UUID = "6e400001-b5a3-f393-e0a9-e50e24dcca9e"  # Nordic UART Service UUID
-SONICWAVE_RX_CHAR_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"  # RX Characteristic (we receive data here)
-SONICWAVE_TX_CHAR_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"  # TX Characteristic (we send data here)
+# SonicWave BLE service and characteristic UUIDs, parsed once at import
+NUS_SERVICE = uuid.UUID("6e400001-b5a3-f393-e0a9-e50e24dcca9e")  # Nordic UART Service UUID
+NUS_RX = uuid.UUID("6e400002-b5a3-f393-e0a9-e50e24dcca9e")  # RX Characteristic (we receive data here)
+NUS_TX = uuid.UUID("6e400003-b5a3-f393-e0a9-e50e24dcca9e")  # TX Characteristic (we send data here)
+
+# String forms for APIs that match on advertised UUID strings
+SONICWAVE_SERVICE_UUID = str(NUS_SERVICE)
+SONICWAVE_RX_CHAR_UUID = str(NUS_RX)
+SONICWAVE_TX_CHAR_UUID = str(NUS_TX)
+
+# Chunking: 235-byte writes keep the link pipelined far better than MTU-sized ones
+DEFAULT_CHUNK_SIZE = 235
+CHUNK_HEADER_SIZE = 50  # Room reserved for the "CHUNK:<client_id>:<n>:" prefix
+
+# Senders should back off once this many packets are waiting to go out
+SEND_QUEUE_HIGH_WATER = 8
+
+# Adverts weaker than this are too faint to hold a usable connection
+MIN_RSSI = -85
+
+# Every Nth discovery cycle scans unfiltered to find peers that only advertise a name
+UNFILTERED_SCAN_EVERY = 6
 
 @dataclass
 class BLEPeer:
@@ -50,6 +72,8 @@ class BLEPeer:
     last_seen: float
     packets_sent: int = 0
     connection_failures: int = 0
+    rssi: Optional[int] = None
+    name_only: bool = False  # Advertises no service UUID, so filtered scans miss it
 
 class BLEMeshTransport(BaseTransport):
     """
@@ -59,14 +83,22 @@ class BLEMeshTransport(BaseTransport):
     - Maintains GATT client architecture for reliable communication
     """
 
-    def __init__(self, message_queue: asyncio.Queue, packet_manager):
+    def __init__(self, message_queue: asyncio.Queue, packet_manager, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 min_rssi: int = MIN_RSSI):
         super().__init__(message_queue, packet_manager)
         self.running = False
+        self.chunk_size = chunk_size
+        self.min_rssi = min_rssi
+        self.passive_scanning = True  # Dropped after the first backend refusal
+        self._scan_cycles = 0
 
         # Peer management
         self.discovered_peers: Dict[str, BLEPeer] = {}
         self.connected_devices: Dict[str, BleakClient] = {}
         self.pending_packets: asyncio.Queue = asyncio.Queue()
+        self.peer_discovered = asyncio.Event()  # Pulsed whenever a new peer is added
+        self.send_queue_not_full = asyncio.Event()  # Clear while pending_packets is above the high-water mark
+        self.send_queue_not_full.set()
 
         # Background tasks
         self.discover_task = None
@@ -166,17 +198,29 @@ class BLEMeshTransport(BaseTransport):
 
         logger.info("BLE transport stopped")
 
-    async def send(self, packet: SOSPacket):
+    async def send(self, packet: SOSPacket, chunk_size: Optional[int] = None):
         """Queue a packet for BLE transmission to discovered peers."""
         if not self.running:
             return
 
         try:
-            await self.pending_packets.put(packet)
+            await self.pending_packets.put((packet, chunk_size or self.chunk_size))
+            if self.pending_packets.qsize() > SEND_QUEUE_HIGH_WATER:
+                self.send_queue_not_full.clear()
             logger.debug(f"Queued packet {packet.packet_id} for BLE transmission")
         except Exception as e:
             logger.error(f"Error queuing BLE packet: {e}")
 
+    async def wait_for_send_capacity(self, timeout: float = 2.0) -> bool:
+        """Wait until the send queue drops below the high-water mark; False on timeout."""
+        if self.send_queue_not_full.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self.send_queue_not_full.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
     async def _discovery_loop(self):
         """Continuously discover BLE devices using bleak library."""
         while self.running:
@@ -188,8 +232,8 @@ class BLEMeshTransport(BaseTransport):
 
                 # Use bleak BleakScanner.discover() function
                 try:
-                    # Call bleak discover function - returns a list of BLEDevice objects
-                    devices = await BleakScanner.discover(timeout=5.0)
+                    discovered = await self._scan()
+                    devices = [(device, adv) for device, adv in discovered.values() if self._passive_filter(adv)]
 
                     logger.info(f"Found {len(devices)} BLE devices")
 
@@ -199,7 +243,7 @@ class BLEMeshTransport(BaseTransport):
                     devices = []
 
                 # Process discovered devices
-                for i, device in enumerate(devices):
+                for i, (device, adv) in enumerate(devices):
                     if not self.running:
                         break
 
@@ -218,21 +262,28 @@ class BLEMeshTransport(BaseTransport):
                         address = str(device)
                         name = "Unknown"
 
+                    # Known peer: refresh it and skip the SonicWave check
+                    peer = self.discovered_peers.get(address)
+                    if peer is not None:
+                        peer.rssi = adv.rssi
+                        peer.last_seen = current_time
+                        continue
+
                     # Check if this is a SonicWave device
                     if self._is_sonicwave_device(device, name):
-                        if address not in self.discovered_peers:
-                            self.discovered_peers[address] = BLEPeer(
-                                device=device,
-                                address=address,
-                                name=name,
-                                last_seen=current_time
-                            )
-                            self.stats['peers_discovered'] += 1
-                            discovered_count += 1
-                            logger.info(f"Discovered SonicWave BLE device: {address} ({name})")
-                        else:
-                            # Update last seen time
-                            self.discovered_peers[address].last_seen = current_time
+                        self.discovered_peers[address] = BLEPeer(
+                            device=device,
+                            address=address,
+                            name=name,
+                            last_seen=current_time,
+                            rssi=adv.rssi,
+                            name_only=SONICWAVE_SERVICE_UUID not in (adv.service_uuids or ())
+                        )
+                        self.stats['peers_discovered'] += 1
+                        discovered_count += 1
+                        self.peer_discovered.set()
+                        self.peer_discovered.clear()
+                        logger.info(f"Discovered SonicWave BLE device: {address} ({name})")
 
                 self.stats['discoveries_performed'] += 1
 
@@ -276,6 +327,40 @@ class BLEMeshTransport(BaseTransport):
         except Exception as e:
             logger.error(f"Failed to start BLE advertising: {e}")
 
+    async def _scan(self) -> Dict:
+        """Run this cycle's single scan, passively where the backend supports it."""
+        cycle = self._scan_cycles
+        self._scan_cycles += 1
+
+        # Peers that only identify themselves by name don't advertise the
+        # service UUID, so scan unfiltered while any are known and every
+        # few cycles to find new ones
+        if cycle % UNFILTERED_SCAN_EVERY == 0 or any(
+                peer.name_only for peer in self.discovered_peers.values()):
+            return await self._discover()
+
+        # Otherwise filter on our service UUID so the OS scanner drops
+        # unrelated adverts before they reach Python
+        return await self._discover(service_uuids=[SONICWAVE_SERVICE_UUID])
+
+    async def _discover(self, **filters) -> Dict:
+        """Run one discovery pass, falling back to active scanning if passive fails."""
+        scan_args = dict(timeout=5.0, return_adv=True, **filters)
+
+        if self.passive_scanning:
+            try:
+                # Passive mode sends no scan requests and wakes us less often
+                return await BleakScanner.discover(scanning_mode="passive", **scan_args)
+            except (BleakError, ValueError) as e:
+                logger.info(f"Passive BLE scanning unavailable, using active scanning: {e}")
+                self.passive_scanning = False
+
+        return await BleakScanner.discover(**scan_args)
+
+    def _passive_filter(self, adv: "AdvertisementData") -> bool:
+        """Drop adverts too faint to be worth connecting to."""
+        return adv.rssi is None or adv.rssi >= self.min_rssi
+
     def _is_sonicwave_device(self, device: BleakBLEDevice, name: str) -> bool:
         """Determine if a device is a SonicWave device."""
         # Add your filtering logic here
@@ -295,16 +380,19 @@ class BLEMeshTransport(BaseTransport):
             try:
                 # Wait for packets to send
                 try:
-                    packet = await asyncio.wait_for(
+                    packet, chunk_size = await asyncio.wait_for(
                         self.pending_packets.get(),
                         timeout=1.0
                     )
                 except asyncio.TimeoutError:
                     continue
 
+                if self.pending_packets.qsize() <= SEND_QUEUE_HIGH_WATER:
+                    self.send_queue_not_full.set()
+
                 # Send packet to all connected peers
                 if self.connected_devices:
-                    await self._broadcast_packet_to_peers(packet)
+                    await self._broadcast_packet_to_peers(packet, chunk_size)
                 else:
                     logger.debug(f"No connected BLE peers for packet {packet.packet_id}")
 
@@ -357,7 +445,7 @@ class BLEMeshTransport(BaseTransport):
             if client.is_connected:
                 # Set up notification callback for receiving data
                 await client.start_notify(
-                    SONICWAVE_TX_CHAR_UUID,
+                    NUS_TX,
                     lambda sender, data: self._on_notification_received(peer.address, sender, data)
                 )
 
@@ -456,12 +544,20 @@ class BLEMeshTransport(BaseTransport):
             self.stats['active_connections'] -= 1
             logger.info(f"BLE device {device_address} disconnected")
 
-    async def _broadcast_packet_to_peers(self, packet: SOSPacket):
+    @staticmethod
+    def _encode_packet(packet: SOSPacket) -> bytes:
+        """Get the wire bytes for a packet."""
+        return packet.to_json().encode('utf-8')
+
+    async def _broadcast_packet_to_peers(self, packet: SOSPacket, chunk_size: Optional[int] = None):
         """Send a packet to all connected peers."""
+        # Encode once and share the buffer across every peer
+        packet_bytes = self._encode_packet(packet)
+
         tasks = []
         for address, device in list(self.connected_devices.items()):
             if device.is_connected():
-                task = asyncio.create_task(self._send_packet_to_device(device, packet, address))
+                task = asyncio.create_task(self._send_packet_to_device(device, packet, address, packet_bytes, chunk_size))
                 tasks.append(task)
 
         if tasks:
@@ -470,42 +566,50 @@ class BLEMeshTransport(BaseTransport):
             except asyncio.TimeoutError:
                 logger.warning("BLE broadcast timed out")
 
-    async def _send_packet_to_device(self, client: BleakClient, packet: SOSPacket, address: str):
+    async def _send_packet_to_device(self, client: BleakClient, packet: SOSPacket, address: str,
+                                     packet_bytes: Optional[bytes] = None, chunk_size: Optional[int] = None):
         """Send a packet to a specific connected device."""
         try:
             if not client.is_connected:
                 raise Exception("Device not connected")
 
             # Prepare packet data
-            packet_data = packet.to_json()
-            packet_bytes = packet_data.encode('utf-8')
+            if packet_bytes is None:
+                packet_bytes = self._encode_packet(packet)
 
             # Send data (handle chunking for large packets)
-            max_chunk_size = 180
+            max_chunk_size = chunk_size or self.chunk_size
+
+            # Never write more than the negotiated ATT payload allows
+            mtu = getattr(client, 'mtu_size', None)
+            if mtu and mtu - 3 > CHUNK_HEADER_SIZE:
+                max_chunk_size = min(max_chunk_size, mtu - 3)
 
             if len(packet_bytes) <= max_chunk_size:
                 # Send as single packet
-                await client.write_gatt_char(SONICWAVE_RX_CHAR_UUID, packet_bytes)
+                await client.write_gatt_char(NUS_RX, packet_bytes)
             else:
                 # Send in chunks
                 client_id = f"client_{int(time.time() * 1000) % 10000}"
+                packet_data = packet_bytes.decode('utf-8')
                 chunks = []
 
                 # Split data into chunks
-                for i in range(0, len(packet_data), max_chunk_size - 50):
-                    chunk_data = packet_data[i:i + max_chunk_size - 50]
+                chunk_payload = max_chunk_size - CHUNK_HEADER_SIZE
+                for i in range(0, len(packet_data), chunk_payload):
+                    chunk_data = packet_data[i:i + chunk_payload]
                     chunk_num = len(chunks)
                     chunk_msg = f"CHUNK:{client_id}:{chunk_num}:{chunk_data}"
                     chunks.append(chunk_msg.encode('utf-8'))
 
                 # Send all chunks
                 for chunk in chunks:
-                    await client.write_gatt_char(SONICWAVE_RX_CHAR_UUID, chunk)
+                    await client.write_gatt_char(NUS_RX, chunk)
                     await asyncio.sleep(0.1)
 
                 # Send end marker
                 end_msg = f"END:{client_id}:{len(chunks)}"
-                await client.write_gatt_char(SONICWAVE_RX_CHAR_UUID, end_msg.encode('utf-8'))
+                await client.write_gatt_char(NUS_RX, end_msg.encode('utf-8'))
 
             # Update peer stats
             if address in self.discovered_peers:
@@ -568,6 +672,7 @@ class BLEMeshTransport(BaseTransport):
                 'address': peer.address,
                 'name': peer.name,
                 'last_seen': peer.last_seen,
+                'rssi': peer.rssi,
                 'packets_sent': peer.packets_sent,
                 'connection_failures': peer.connection_failures,
                 'connected': peer.address in self.connected_devices
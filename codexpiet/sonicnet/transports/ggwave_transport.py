@@ -104,6 +104,7 @@ class GGWaveSender(BaseTransportSender):
             # Ensure sender ID is set
             if not packet.sender_id:
                 packet.sender_id = self.node_id
+                packet.sender_short = packet.sender_id[:8]
 
             # Prepare packet data
             packet_data = packet.to_json()
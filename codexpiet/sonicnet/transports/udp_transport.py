@@ -56,6 +56,7 @@ class UDPSender(BaseTransportSender):
             # Ensure sender ID is set to this node's ID
             if not packet.sender_id:
                 packet.sender_id = self.node_id
+                packet.sender_short = packet.sender_id[:8]
 
             # Send the packet
             self.sock.sendto(packet.to_json().encode('utf-8'), (UDP_MULTICAST_GROUP, UDP_PORT))